@@ -0,0 +1,198 @@
+import os
+from functools import lru_cache, partial
+import numpy as np
+import librosa
+import soundfile as sf
+from scipy.signal import butter, sosfiltfilt
+import spectral_gate
+from batch_manifest import BatchManifest, params_fingerprint
+from batch_pool import default_worker_count, find_files, run_pool
+from instrumentation import StageMetrics, stage, summarize, format_summary, write_metrics
+
+SUPPORTED_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.flac')
+STREAM_BLOCK_SECONDS = 10.0
+FILTER_CACHE_SIZE = 32
+# Matches spectral_gate.TIME_CONSTANT_S, the longest memory in the pipeline
+STREAM_PAD_SECONDS = 2.0
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def butter_bandpass(lowcut, highcut, fs, order=5):
+    # Second-order sections stay stable at high orders and low cutoffs where (b, a) does not.
+    # The returned array is shared between callers through the cache and must not be modified.
+    nyq = 0.5 * fs
+    low = lowcut / nyq
+    high = highcut / nyq
+    sos = butter(order, [low, high], btype='band', output='sos')
+    return sos
+
+def bandpass_filter(data, lowcut, highcut, fs, order=5):
+    sos = butter_bandpass(lowcut, highcut, fs, order=order)
+    if data.dtype == np.float32:
+        sos = sos.astype(np.float32)
+    y = sosfiltfilt(sos, data, axis=-1)
+    return y
+
+def find_audio_files(input_dir):
+    return find_files(input_dir, SUPPORTED_EXTENSIONS)
+
+def capture_noise_profile(input_path, noise_start, noise_end, n_fft=2048, win_length=2048,
+                          hop_length=512):
+    # Reads only the noise_start-noise_end range, for saving with noise_profiles.save_noise_profile
+    info = sf.info(input_path)
+    start_idx = int(noise_start * info.samplerate / 1000)
+    end_idx = int(noise_end * info.samplerate / 1000)
+    if end_idx <= start_idx or end_idx > info.frames:
+        raise ValueError("Invalid noise sample indices")
+    noise, sr = sf.read(input_path, start=start_idx, stop=end_idx, dtype='float32', always_2d=True)
+    return spectral_gate.compute_noise_profile(noise.T, sr, n_fft=n_fft, win_length=win_length,
+                                               hop_length=hop_length)
+
+def denoise_channels(y, sr, volume_boost, prop_decrease=1.0, n_fft=2048, win_length=2048,
+                     hop_length=512, filter_order=6, lowcut=80.0, highcut=16000.0, float32=False,
+                     noise_profile=None, metrics=None):
+    # y is (channels, frames); all channels are gated, filtered and boosted as one 2-D array.
+    # With float32 nothing is promoted to float64, otherwise the gate and filter run in float64.
+    if float32:
+        y = y.astype(np.float32, copy=False)
+    processed = spectral_gate.reduce_noise(y, sr, prop_decrease=prop_decrease, n_fft=n_fft,
+                                           win_length=win_length, hop_length=hop_length,
+                                           dtype=np.float32 if float32 else np.float64,
+                                           noise_profile=noise_profile, metrics=metrics)
+    with stage(metrics, "bandpass"):
+        processed = bandpass_filter(processed, lowcut, highcut, sr, order=filter_order)
+    with stage(metrics, "gain_clip"):
+        processed *= 10 ** (volume_boost / 20.0)
+        np.clip(processed, -1.0, 1.0, out=processed)
+    return processed
+
+def denoise_file(input_path, output_path, noise_start, noise_end, volume_boost,
+                 prop_decrease=1.0, n_fft=2048, win_length=2048, hop_length=512,
+                 filter_order=6, lowcut=80.0, highcut=16000.0, preserve_bit_depth=True,
+                 streaming=False, block_seconds=STREAM_BLOCK_SECONDS, float32=False,
+                 noise_profile=None, track_memory=False):
+    # Runs without any Tk state so it can be shipped to worker processes. A noise_profile
+    # from noise_profiles replaces the per-file noise sample, so noise_start/noise_end are
+    # not checked against the file. Returns the per-stage timings of this file.
+    metrics = StageMetrics(track_memory)
+    params = dict(prop_decrease=prop_decrease, n_fft=n_fft, win_length=win_length,
+                  hop_length=hop_length, filter_order=filter_order, lowcut=lowcut, highcut=highcut,
+                  float32=float32, noise_profile=noise_profile, metrics=metrics)
+    subtype = 'PCM_16'
+    if preserve_bit_depth:
+        subtype = 'PCM_32'
+    if streaming:
+        denoise_file_streaming(input_path, output_path, noise_start, noise_end, volume_boost,
+                               subtype, block_seconds, **params)
+        return metrics.as_dict()
+    with stage(metrics, "decode"):
+        y, sr = librosa.load(input_path, sr=None, mono=False, dtype=np.float32)
+    if y.ndim == 1:
+        y = np.expand_dims(y, axis=0)
+    start_idx = int(noise_start * sr / 1000)
+    end_idx = int(noise_end * sr / 1000)
+    if noise_profile is None and (end_idx <= start_idx or end_idx > y.shape[1]):
+        raise ValueError("Invalid noise sample indices")
+    processed = denoise_channels(y, sr, volume_boost, **params)
+    if processed.shape[0] == 1:
+        processed_audio = processed[0]
+    else:
+        processed_audio = processed.T
+    with stage(metrics, "encode"):
+        sf.write(output_path, processed_audio, sr, subtype=subtype)
+    return metrics.as_dict()
+
+def denoise_file_streaming(input_path, output_path, noise_start, noise_end, volume_boost,
+                           subtype, block_seconds=STREAM_BLOCK_SECONDS, **params):
+    # Processes the file in blocks of block_seconds, each read with STREAM_PAD_SECONDS of
+    # context on both sides so the gating and the zero-phase filter settle before the
+    # kept region. Only the centre of every block is written, so peak memory depends on
+    # the block size and not on the length of the recording.
+    with sf.SoundFile(input_path) as src:
+        sr = src.samplerate
+        total_frames = src.frames
+        start_idx = int(noise_start * sr / 1000)
+        end_idx = int(noise_end * sr / 1000)
+        if params["noise_profile"] is None and (end_idx <= start_idx or end_idx > total_frames):
+            raise ValueError("Invalid noise sample indices")
+        block = max(1, int(block_seconds * sr))
+        pad = int(STREAM_PAD_SECONDS * sr)
+        with sf.SoundFile(output_path, 'w', samplerate=sr, channels=src.channels,
+                          subtype=subtype) as dst:
+            for block_start in range(0, total_frames, block):
+                block_end = min(block_start + block, total_frames)
+                read_start = max(0, block_start - pad)
+                read_end = min(total_frames, block_end + pad)
+                with stage(params["metrics"], "decode"):
+                    src.seek(read_start)
+                    chunk = src.read(read_end - read_start, dtype='float32', always_2d=True).T
+                processed = denoise_channels(chunk, sr, volume_boost, **params)
+                with stage(params["metrics"], "encode"):
+                    dst.write(processed[:, block_start - read_start:block_end - read_start].T)
+
+def denoise_batch(input_dir, output_dir, noise_start, noise_end, volume_boost, params,
+                  workers=None, resume=True, use_hash=False, log=None, progress=None,
+                  should_stop=None, track_memory=False, metrics_path=None):
+    # Denoises every supported file under input_dir into the same layout under output_dir
+    # on a process pool. log(message), progress(done, total) and should_stop() let the
+    # GUI and the CLI report and cancel; they are called from the calling thread. The
+    # per-stage timings of all files are summarized in the log and, with metrics_path,
+    # written to a .json or .csv file.
+    log = log or (lambda message: None)
+    progress = progress or (lambda done, total: None)
+    should_stop = should_stop or (lambda: False)
+    workers = workers or default_worker_count()
+    result = {"found": 0, "total": 0, "processed": 0, "skipped": 0, "cancelled": 0, "errors": {},
+              "stages": {}}
+    records = {}
+    file_list = find_audio_files(input_dir)
+    result["found"] = len(file_list)
+    if not file_list:
+        return result
+    manifest = BatchManifest(output_dir, use_hash=use_hash)
+    fingerprint = params_fingerprint(dict(params, noise_start=noise_start, noise_end=noise_end,
+                                          volume_boost=volume_boost))
+    jobs = []
+    for input_path in file_list:
+        rel_path = os.path.relpath(input_path, input_dir)
+        output_path = os.path.join(output_dir, rel_path)
+        if resume and manifest.is_up_to_date(rel_path, input_path, output_path, fingerprint):
+            result["skipped"] += 1
+        else:
+            jobs.append((rel_path, input_path, output_path))
+    if result["skipped"]:
+        log(f"Skipping {result['skipped']} files already up to date")
+    total_files = result["total"] = len(jobs)
+    progress(0, total_files)
+    log(f"Processing {total_files} files with {workers} workers")
+    process = partial(denoise_file, noise_start=noise_start, noise_end=noise_end, volume_boost=volume_boost,
+                      track_memory=track_memory, **params)
+    tasks = []
+    for rel_path, input_path, output_path in jobs:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        signature = manifest.source_signature(input_path)
+        tasks.append(((rel_path, input_path, signature), process, input_path, output_path))
+
+    def on_done(key, record, error):
+        rel_path, input_path, signature = key
+        if error is None:
+            result["processed"] += 1
+            records[rel_path] = record
+            manifest.record(rel_path, input_path, fingerprint, signature)
+            log(f"Processed: {os.path.basename(input_path)}")
+        else:
+            result["errors"][rel_path] = str(error)
+            log(f"Error processing {os.path.basename(input_path)}: {str(error)}")
+
+    try:
+        result["cancelled"] = run_pool(tasks, on_done, workers, log, progress, should_stop)
+    finally:
+        manifest.save()
+    if records:
+        result["stages"] = summarize(records)
+        log("Stage summary:")
+        for line in format_summary(result["stages"]):
+            log("  " + line)
+        if metrics_path:
+            write_metrics(metrics_path, records)
+            log(f"Metrics written to {metrics_path}")
+    return result
@@ -1,24 +1,10 @@
 import os
 import threading
-import numpy as np
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import librosa
-import noisereduce as nr
-import soundfile as sf
-from scipy.signal import butter, filtfilt
-
-def butter_bandpass(lowcut, highcut, fs, order=5):
-    nyq = 0.5 * fs
-    low = lowcut / nyq
-    high = highcut / nyq
-    b, a = butter(order, [low, high], btype='band')
-    return b, a
-
-def bandpass_filter(data, lowcut, highcut, fs, order=5):
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = filtfilt(b, a, data)
-    return y
+from tkinter import ttk, filedialog, messagebox, simpledialog
+from audio_denoiser import denoise_file, denoise_batch, capture_noise_profile
+from batch_pool import default_worker_count
+from noise_profiles import list_noise_profiles, load_noise_profile, save_noise_profile, PER_FILE_NOISE
 
 class AudioDenoiserTab:
     def __init__(self, parent):
@@ -26,6 +12,7 @@ class AudioDenoiserTab:
         self.root = parent.winfo_toplevel()
         self.frame = ttk.Frame(parent, padding=10)
         self.processing = False
+        self.stop_event = None
         self.create_widgets()
 
     def create_widgets(self):
@@ -61,6 +48,12 @@ class AudioDenoiserTab:
         self.noise_end.grid(row=0, column=3, padx=5)
         self.noise_start.insert(0, "0")
         self.noise_end.insert(0, "1000")
+        ttk.Label(noise_frame, text="Noise Profile:").grid(row=0, column=4, padx=5)
+        self.noise_profile_var = tk.StringVar(value=PER_FILE_NOISE)
+        self.noise_profile_menu = ttk.Combobox(noise_frame, textvariable=self.noise_profile_var, state="readonly", width=18)
+        self.noise_profile_menu.grid(row=0, column=5, padx=5)
+        ttk.Button(noise_frame, text="Capture...", command=self.capture_profile).grid(row=0, column=6, padx=5)
+        self.refresh_profiles()
 
         quality_frame = ttk.Labelframe(self.main_frame, text="Quality Settings", padding=10)
         quality_frame.grid(row=3, column=0, sticky=tk.EW, pady=10)
@@ -78,6 +71,23 @@ class AudioDenoiserTab:
         self.high_cut.pack(side=tk.LEFT, padx=2)
         self.high_cut.insert(0, "16000")
         ttk.Label(freq_frame, text="Hz").pack(side=tk.LEFT)
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(quality_frame, text="Streaming Mode (constant memory for long recordings)", variable=self.streaming_var).grid(row=2, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        self.float32_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(quality_frame, text="Float32 Processing (half the memory, slightly lower precision)", variable=self.float32_var).grid(row=3, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        self.resume_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(quality_frame, text="Skip Files Already Up to Date (resume interrupted batches)", variable=self.resume_var).grid(row=4, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        self.hash_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(quality_frame, text="Verify Changed Files by Content Hash", variable=self.hash_var).grid(row=5, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        self.track_memory_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(quality_frame, text="Track Peak Memory per Stage (slower)", variable=self.track_memory_var).grid(row=6, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        ttk.Label(quality_frame, text="Metrics File (optional):").grid(row=7, column=0, sticky=tk.W, padx=5, pady=2)
+        metrics_frame = ttk.Frame(quality_frame)
+        metrics_frame.grid(row=7, column=1, sticky=tk.EW, padx=5, pady=2)
+        metrics_frame.columnconfigure(0, weight=1)
+        self.metrics_path = ttk.Entry(metrics_frame)
+        self.metrics_path.grid(row=0, column=0, sticky=tk.EW)
+        ttk.Button(metrics_frame, text="Browse", command=self.select_metrics_path).grid(row=0, column=1, padx=5)
 
         volume_frame = ttk.Frame(self.main_frame)
         volume_frame.grid(row=4, column=0, sticky=tk.EW, pady=5)
@@ -114,6 +124,10 @@ class AudioDenoiserTab:
         self.filter_order = ttk.Entry(adv_frame, width=8)
         self.filter_order.grid(row=4, column=1, sticky=tk.W, padx=5, pady=2)
         self.filter_order.insert(0, "6")
+        ttk.Label(adv_frame, text="Parallel Workers:").grid(row=5, column=0, sticky=tk.W, padx=5, pady=2)
+        self.workers = ttk.Spinbox(adv_frame, from_=1, to=os.cpu_count() or 1, width=6)
+        self.workers.grid(row=5, column=1, sticky=tk.W, padx=5, pady=2)
+        self.workers.set(default_worker_count())
         ttk.Button(adv_frame, text="Help / Guide", command=self.show_help).grid(row=0, column=2, rowspan=2, padx=10, pady=2)
 
         self.progress = ttk.Progressbar(self.main_frame, orient=tk.HORIZONTAL, mode='determinate')
@@ -148,7 +162,13 @@ class AudioDenoiserTab:
             "FFT Size (n_fft): e.g., 2048.\n"
             "Window Length (win_length): Typically equal to n_fft.\n"
             "Hop Length (hop_length): Commonly n_fft/4.\n"
-            "Butterworth Filter Order: Typical values between 4 and 8."
+            "Butterworth Filter Order: Typical values between 4 and 8.\n"
+            "Parallel Workers: Files processed at once, defaults to CPU cores - 1.\n\n"
+            "Noise Profile: Capture the noise sample range of one file once and reuse it for a\n"
+            "whole batch. Files then need no leading silence; the profile's sample rate and\n"
+            "FFT settings must match the files and the advanced parameters.\n\n"
+            "Stage Metrics: After each batch the log shows where the time went (decode, STFT,\n"
+            "gating, filter, encode). A metrics file keeps the per-file numbers as JSON or CSV."
         )
         messagebox.showinfo("Help / Guide", help_text)
 
@@ -164,102 +184,140 @@ class AudioDenoiserTab:
             self.output_dir.delete(0, tk.END)
             self.output_dir.insert(0, directory)
 
+    def select_metrics_path(self):
+        path = filedialog.asksaveasfilename(
+            title="Save Stage Metrics As",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")]
+        )
+        if path:
+            self.metrics_path.delete(0, tk.END)
+            self.metrics_path.insert(0, path)
+
+    def refresh_profiles(self):
+        self.noise_profile_menu.config(values=[PER_FILE_NOISE] + list_noise_profiles())
+
+    def capture_profile(self):
+        input_path = filedialog.askopenfilename(
+            title="Select Noise Reference File",
+            filetypes=[("Audio files", "*.wav *.mp3 *.ogg *.flac")]
+        )
+        if not input_path:
+            return
+        name = simpledialog.askstring("Noise Profile", "Save profile as:", parent=self.root)
+        if not name:
+            return
+        try:
+            profile = capture_noise_profile(
+                input_path,
+                float(self.noise_start.get()),
+                float(self.noise_end.get()),
+                n_fft=int(self.n_fft.get()),
+                win_length=int(self.win_length.get()),
+                hop_length=int(self.hop_length.get())
+            )
+            save_noise_profile(name, profile)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to capture noise profile:\n{e}")
+            return
+        self.refresh_profiles()
+        self.noise_profile_var.set(name)
+        self.log_message(f"Captured noise profile '{name}' at {profile['sr']} Hz from {os.path.basename(input_path)}")
+
     def log_message(self, message):
         self.root.after(0, lambda: (self.log.insert(tk.END, message + "\n"),
                                       self.log.see(tk.END)))
 
+    def get_params(self):
+        # Read every Tk widget once so the values can be shipped to worker processes
+        return {
+            "prop_decrease": float(self.prop_decrease.get()),
+            "n_fft": int(self.n_fft.get()),
+            "win_length": int(self.win_length.get()),
+            "hop_length": int(self.hop_length.get()),
+            "filter_order": int(self.filter_order.get()),
+            "lowcut": float(self.low_cut.get()),
+            "highcut": float(self.high_cut.get()),
+            "preserve_bit_depth": self.bit_depth_var.get(),
+            "streaming": self.streaming_var.get(),
+            "float32": self.float32_var.get(),
+            "noise_profile": self.get_noise_profile(),
+        }
+
+    def get_noise_profile(self):
+        name = self.noise_profile_var.get()
+        if name == PER_FILE_NOISE:
+            return None
+        return load_noise_profile(name)
+
     def process_audio_file(self, input_path, output_path, noise_start, noise_end, volume_boost):
         try:
-            y, sr = librosa.load(input_path, sr=None, mono=False)
-            if y.ndim == 1:
-                y = np.expand_dims(y, axis=0)
-            start_idx = int(noise_start * sr / 1000)
-            end_idx = int(noise_end * sr / 1000)
-            if end_idx <= start_idx or end_idx > y.shape[1]:
-                raise ValueError("Invalid noise sample indices")
-            prop_decrease = float(self.prop_decrease.get())
-            n_fft = int(self.n_fft.get())
-            win_length = int(self.win_length.get())
-            hop_length = int(self.hop_length.get())
-            filter_order = int(self.filter_order.get())
-            processed_channels = []
-            for channel in y:
-                noise_sample = channel[start_idx:end_idx]
-                reduced = nr.reduce_noise(
-                    y=channel,
-                    y_noise=noise_sample,
-                    sr=sr,
-                    prop_decrease=prop_decrease,
-                    n_fft=n_fft,
-                    win_length=win_length,
-                    hop_length=hop_length
-                )
-                lowcut = float(self.low_cut.get())
-                highcut = float(self.high_cut.get())
-                filtered = bandpass_filter(reduced, lowcut, highcut, sr, order=filter_order)
-                boost_gain = 10 ** (volume_boost / 20.0)
-                boosted = filtered * boost_gain
-                boosted = np.clip(boosted, -1.0, 1.0)
-                processed_channels.append(boosted)
-            if len(processed_channels) == 1:
-                processed_audio = processed_channels[0]
-            else:
-                processed_audio = np.stack(processed_channels, axis=-1)
-            subtype = 'PCM_16'
-            if self.bit_depth_var.get():
-                subtype = 'PCM_32'
-            sf.write(output_path, processed_audio, sr, subtype=subtype)
+            denoise_file(input_path, output_path, noise_start, noise_end, volume_boost, **self.get_params())
             return True
         except Exception as e:
             self.log_message(f"Error processing {os.path.basename(input_path)}: {str(e)}")
             return False
 
-    def batch_process(self):
-        input_dir = self.input_dir.get()
-        output_dir = self.output_dir.get()
-        if not input_dir or not output_dir:
-            messagebox.showerror("Error", "Please select both input and output directories")
-            return
+    def batch_process(self, stop_event):
+        # Start is given back however the run ends
         try:
-            noise_start = float(self.noise_start.get())
-            noise_end = float(self.noise_end.get())
-            volume_boost = float(self.vol_spin.get())
-            if noise_start >= noise_end:
-                raise ValueError
-        except Exception:
-            messagebox.showerror("Error", "Invalid parameters")
-            return
-        supported_ext = ('.wav', '.mp3', '.ogg', '.flac')
-        file_list = []
-        for root_dir, _, files in os.walk(input_dir):
-            for file in files:
-                if file.lower().endswith(supported_ext):
-                    file_list.append(os.path.join(root_dir, file))
-        total_files = len(file_list)
-        if total_files == 0:
-            messagebox.showinfo("Info", "No supported audio files found")
-            return
-        self.root.after(0, lambda: self.progress.config(maximum=total_files, value=0))
-        processed = 0
-        for idx, input_path in enumerate(file_list):
-            if not self.processing:
-                break
-            rel_path = os.path.relpath(input_path, input_dir)
-            output_path = os.path.join(output_dir, rel_path)
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            self.log_message(f"Processing: {os.path.basename(input_path)}")
-            if self.process_audio_file(input_path, output_path, noise_start, noise_end, volume_boost):
-                processed += 1
-            self.root.after(0, lambda v=idx+1: self.progress.config(value=v))
-        messagebox.showinfo("Complete", f"Processed {processed}/{total_files} files")
-        self.processing = False
-        self.root.after(0, lambda: self.start_btn.config(text="Start Processing"))
+            input_dir = self.input_dir.get()
+            output_dir = self.output_dir.get()
+            if not input_dir or not output_dir:
+                messagebox.showerror("Error", "Please select both input and output directories")
+                return
+            try:
+                noise_start = float(self.noise_start.get())
+                noise_end = float(self.noise_end.get())
+                volume_boost = float(self.vol_spin.get())
+                workers = int(self.workers.get())
+                params = self.get_params()
+                if noise_start >= noise_end or workers < 1:
+                    raise ValueError
+            except Exception:
+                messagebox.showerror("Error", "Invalid parameters")
+                return
+            try:
+                result = denoise_batch(
+                    input_dir, output_dir, noise_start, noise_end, volume_boost, params,
+                    workers=workers,
+                    resume=self.resume_var.get(),
+                    use_hash=self.hash_var.get(),
+                    log=self.log_message,
+                    progress=self.update_progress,
+                    should_stop=stop_event.is_set,
+                    track_memory=self.track_memory_var.get(),
+                    metrics_path=self.metrics_path.get().strip() or None
+                )
+            except Exception as e:
+                messagebox.showerror("Error", f"Batch processing failed:\n{e}")
+                return
+            if result["found"] == 0:
+                messagebox.showinfo("Info", "No supported audio files found")
+            else:
+                messagebox.showinfo("Complete", f"Processed {result['processed']}/{result['total']} files"
+                                                f" ({result['skipped']} already up to date)")
+        finally:
+            self.finish_processing()
+
+    def update_progress(self, done, total):
+        self.root.after(0, lambda: self.progress.config(maximum=max(total, 1), value=done))
+
+    def finish_processing(self):
+        # Called from the worker thread when its run is over; only then can a new run start
+        def release():
+            self.processing = False
+            self.start_btn.config(text="Start Processing", state="normal")
+        self.root.after(0, release)
 
     def start_processing(self):
         if not self.processing:
             self.processing = True
+            # Each run gets its own stop flag, so stopping one run cannot cancel the next
+            self.stop_event = threading.Event()
             self.start_btn.config(text="Stop Processing")
-            threading.Thread(target=self.batch_process, daemon=True).start()
+            threading.Thread(target=self.batch_process, args=(self.stop_event,), daemon=True).start()
         else:
-            self.processing = False
-            self.start_btn.config(text="Start Processing")
+            # The run cancels its pending files; the button comes back when its thread ends
+            self.stop_event.set()
+            self.start_btn.config(text="Stopping...", state="disabled")
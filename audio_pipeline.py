@@ -0,0 +1,143 @@
+import os
+import numpy as np
+import librosa
+import soundfile as sf
+from audio_denoiser import denoise_channels, find_audio_files
+from batch_pool import default_worker_count, run_pool
+from audio_splitter import speech_segments
+from silence_detection import envelope_from_samples, detect_silence, ms_to_frames
+from wav_mmap import apply_gain
+from instrumentation import StageMetrics, stage, summarize, format_summary, write_metrics
+
+# Denoise -> split -> encode in one pass over in-memory buffers, instead of writing the
+# denoised file and loading it again in the splitter. config is a dict with
+#   "denoise": None or noise_start, noise_end, volume_boost and denoise_channels keywords
+#   "split":   None or the split_audio keywords (min_silence_len, silence_thresh, ...)
+#   "format":  a key of ENCODE_FORMATS, "bit_depth": 16 or 32
+
+# format -> (soundfile format, subtype for 16-bit, subtype for 32-bit)
+ENCODE_FORMATS = {
+    "wav": ("WAV", "PCM_16", "PCM_32"),
+    "flac": ("FLAC", "PCM_16", "PCM_24"),
+    "mp3": ("MP3", "MPEG_LAYER_III", "MPEG_LAYER_III"),
+}
+
+def quantize(y, sample_width):
+    # (channels, frames) floats to (frames, channels) integers, rounded the way libsndfile
+    # writes PCM_16/PCM_32, so the splitter sees what it would read back from the file
+    samples = np.rint(np.asarray(y, dtype=np.float64).T * 2147483648.0)
+    np.clip(samples, -2147483648.0, 2147483647.0, out=samples)
+    samples = samples.astype(np.int32)
+    if sample_width == 2:
+        samples = (samples >> 16).astype(np.int16)
+    return np.ascontiguousarray(samples)
+
+def encode(path, samples, sr, config):
+    sf_format, subtype_16, subtype_32 = ENCODE_FORMATS[config.get("format", "wav")]
+    subtype = subtype_16 if config.get("bit_depth", 16) == 16 else subtype_32
+    sf.write(path, samples, sr, format=sf_format, subtype=subtype)
+
+def run_pipeline(input_path, output_dir, config, track_memory=False):
+    # Writes output_dir/segment_N.<format>, or output_dir/<name>.<format> without a split
+    # stage; returns the written paths and the per-stage timings
+    metrics = StageMetrics(track_memory)
+    extension = config.get("format", "wav")
+    with stage(metrics, "decode"):
+        y, sr = librosa.load(input_path, sr=None, mono=False, dtype=np.float32)
+    if y.ndim == 1:
+        y = np.expand_dims(y, axis=0)
+
+    denoise = config.get("denoise")
+    if denoise:
+        params = dict(denoise)
+        noise_start = params.pop("noise_start")
+        noise_end = params.pop("noise_end")
+        volume_boost = params.pop("volume_boost")
+        start_idx = int(noise_start * sr / 1000)
+        end_idx = int(noise_end * sr / 1000)
+        if params.get("noise_profile") is None and (end_idx <= start_idx or end_idx > y.shape[1]):
+            raise ValueError("Invalid noise sample indices")
+        y = denoise_channels(y, sr, volume_boost, metrics=metrics, **params)
+
+    sample_width = 2 if config.get("bit_depth", 16) == 16 else 4
+    with stage(metrics, "quantize"):
+        samples = quantize(y, sample_width)
+    del y
+    os.makedirs(output_dir, exist_ok=True)
+
+    split = config.get("split")
+    if not split:
+        output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(input_path))[0] + "." + extension)
+        with stage(metrics, "encode"):
+            encode(output_path, samples, sr, config)
+        return [output_path], metrics.as_dict()
+
+    frames, channels = samples.shape
+    with stage(metrics, "detect"):
+        envelope = envelope_from_samples(samples.reshape(-1), channels, sr, sample_width)
+        silent_ranges = detect_silence(envelope, split["min_silence_len"], split["silence_thresh"])
+    gain = 10 ** (float(split["volume_adjustment"]) / 20) if split.get("apply_gain", True) else None
+    output_paths = []
+    for seg_start, seg_end, _, _ in speech_segments(silent_ranges, len(envelope["energy"]),
+                                                    split["extend_duration_begin"],
+                                                    split["extend_duration_end"]):
+        first, last = (int(frame) for frame in ms_to_frames([seg_start, seg_end], sr))
+        segment = samples[first:last]
+        if last > frames and first < frames:
+            # Zero-pad past the end like pydub slicing does
+            segment = np.concatenate((segment, np.zeros((last - frames, channels), dtype=samples.dtype)))
+        if gain is not None:
+            with stage(metrics, "gain"):
+                segment = apply_gain(segment, gain, sample_width).astype(samples.dtype)
+        segment_path = os.path.join(output_dir, f"segment_{len(output_paths)+1}.{extension}")
+        with stage(metrics, "encode"):
+            encode(segment_path, segment, sr, config)
+        output_paths.append(segment_path)
+    return output_paths, metrics.as_dict()
+
+def pipeline_batch(input_dir, output_dir, config, workers=None, log=None, progress=None,
+                   should_stop=None, track_memory=False, metrics_path=None):
+    # Runs every audio file under input_dir through run_pipeline on a process pool, so
+    # different files are in different stages at the same time. The outputs of dir/name.ext
+    # go to output_dir/dir/name/ when splitting and to output_dir/dir/ otherwise.
+    log = log or (lambda message: None)
+    progress = progress or (lambda done, total: None)
+    should_stop = should_stop or (lambda: False)
+    workers = workers or default_worker_count()
+    result = {"total": 0, "processed": 0, "cancelled": 0, "outputs": 0, "errors": {}, "stages": {}}
+    records = {}
+    file_list = find_audio_files(input_dir)
+    total_files = result["total"] = len(file_list)
+    if not file_list:
+        return result
+    progress(0, total_files)
+    log(f"Processing {total_files} files with {workers} workers")
+    tasks = []
+    for input_path in file_list:
+        rel_path = os.path.relpath(input_path, input_dir)
+        if config.get("split"):
+            file_output_dir = os.path.join(output_dir, os.path.splitext(rel_path)[0])
+        else:
+            file_output_dir = os.path.join(output_dir, os.path.dirname(rel_path))
+        tasks.append((rel_path, run_pipeline, input_path, file_output_dir, config, track_memory))
+
+    def on_done(rel_path, value, error):
+        if error is None:
+            output_paths, records[rel_path] = value
+            result["processed"] += 1
+            result["outputs"] += len(output_paths)
+            log(f"Processed {rel_path}: {len(output_paths)} files written")
+        else:
+            result["errors"][rel_path] = str(error)
+            log(f"Error processing {rel_path}: {error}")
+
+    result["cancelled"] = run_pool(tasks, on_done, workers, log, progress, should_stop)
+    if records:
+        result["stages"] = summarize(records)
+        log("Stage summary:")
+        for line in format_summary(result["stages"]):
+            log("  " + line)
+        if metrics_path:
+            write_metrics(metrics_path, records)
+            log(f"Metrics written to {metrics_path}")
+    return result
@@ -0,0 +1,185 @@
+import os
+from pydub import AudioSegment
+from instrumentation import StageMetrics, stage, summarize, format_summary
+from silence_detection import energy_envelope, detect_silence, envelope_blocks, SilenceStream, duration_ms, ms_to_frames
+from segment_index import segment_record, write_segment_index
+from wav_mmap import MappedWav
+from batch_pool import default_worker_count, find_files, run_pool
+
+def speech_segments(silent_ranges, length_ms, extend_duration_begin, extend_duration_end):
+    # Yields (seg_start, seg_end, speech_start, speech_end) in ms for every speech run between
+    # the silent ranges; silent_ranges may be a generator that is still detecting
+    prev_end = 0
+    for start, end in silent_ranges:
+        if prev_end < start:
+            # Extend backward without going below 0 and forward without exceeding the length
+            seg_start = max(0, prev_end - extend_duration_begin)
+            seg_end = min(length_ms, start + extend_duration_end)
+            yield seg_start, seg_end, prev_end, start
+        prev_end = end
+
+    if prev_end < length_ms:
+        seg_start = max(0, prev_end - extend_duration_begin)
+        yield seg_start, length_ms, prev_end, length_ms  # Cannot extend beyond the end of the file
+
+def stream_silent_ranges(wav, min_silence_len, silence_thresh, metrics=None):
+    # Silent ranges of a MappedWav, detected one envelope block at a time
+    detector = SilenceStream(wav.frames, wav.channels, wav.frame_rate, wav.sample_width,
+                             min_silence_len, silence_thresh)
+    blocks = envelope_blocks(wav.read, wav.frames, wav.channels, wav.frame_rate, wav.sample_width)
+    while True:
+        with stage(metrics, "detect"):
+            energy = next(blocks, None)
+            silent_ranges = detector.finish() if energy is None else detector.feed(energy)
+        yield from silent_ranges
+        if energy is None:
+            return
+
+def preview_split(envelope, min_silence_len, extend_duration_begin, extend_duration_end, silence_thresh):
+    # What split_audio would write for these settings, from an envelope (see envelope_cache)
+    segments = list(speech_segments(detect_silence(envelope, min_silence_len, silence_thresh),
+                                    len(envelope["energy"]), extend_duration_begin, extend_duration_end))
+    return {
+        "segments": len(segments),
+        "speech_ms": sum(speech_end - speech_start for _, _, speech_start, speech_end in segments),
+        "total_ms": sum(seg_end - seg_start for seg_start, seg_end, _, _ in segments),
+    }
+
+def split_audio(input_path, output_dir, min_silence_len, extend_duration_begin,
+                extend_duration_end, volume_adjustment, silence_thresh, apply_gain=True,
+                metrics=None, streaming=False, index_format=None, envelope=None):
+    # Writes every speech run between silences as segment_N.wav and returns their paths.
+    # With an index_format from INDEX_FORMATS only segments.<format> is written and the
+    # segment records are returned instead, see split_audio_index. A cached envelope of
+    # the file skips the energy pass.
+    if index_format:
+        return split_audio_index(input_path, output_dir, min_silence_len, extend_duration_begin,
+                                 extend_duration_end, volume_adjustment, silence_thresh,
+                                 apply_gain=apply_gain, index_format=index_format, metrics=metrics,
+                                 envelope=envelope)
+    if streaming:
+        return split_audio_streaming(input_path, output_dir, min_silence_len, extend_duration_begin,
+                                     extend_duration_end, volume_adjustment, silence_thresh,
+                                     apply_gain=apply_gain, metrics=metrics, envelope=envelope)
+    with stage(metrics, "decode"):
+        audio = AudioSegment.from_wav(input_path)
+    with stage(metrics, "detect"):
+        if envelope is None:
+            envelope = energy_envelope(audio)
+        silent_ranges = detect_silence(envelope, min_silence_len=min_silence_len,
+                                       silence_thresh=silence_thresh)
+
+    with stage(metrics, "slice"):
+        segments = [audio[seg_start:seg_end] for seg_start, seg_end, _, _ in
+                    speech_segments(silent_ranges, len(audio), extend_duration_begin, extend_duration_end)]
+
+    os.makedirs(output_dir, exist_ok=True)
+    segment_paths = []
+    for i, segment in enumerate(segments):
+        with stage(metrics, "gain"):
+            if apply_gain:
+                adjusted_segment = segment.apply_gain(volume_adjustment)
+            else:
+                adjusted_segment = segment
+
+        segment_path = os.path.join(output_dir, f"segment_{i+1}.wav")
+        with stage(metrics, "encode"):
+            adjusted_segment.export(segment_path, format="wav")
+        segment_paths.append(segment_path)
+    return segment_paths
+
+def split_audio_streaming(input_path, output_dir, min_silence_len, extend_duration_begin,
+                          extend_duration_end, volume_adjustment, silence_thresh, apply_gain=True,
+                          metrics=None, envelope=None):
+    # Writes the same segments as split_audio without loading the file: the WAV data is
+    # memory-mapped, silence is detected one envelope block at a time, and each segment is
+    # copied from the map as soon as the silence after it is found. Memory depends on the
+    # block sizes, not on the length of the recording.
+    os.makedirs(output_dir, exist_ok=True)
+    gain = 10 ** (float(volume_adjustment) / 20) if apply_gain else None
+    segment_paths = []
+    with MappedWav(input_path) as wav:
+        length_ms = duration_ms(wav.frames, wav.frame_rate)
+        if envelope is None:
+            silent_ranges = stream_silent_ranges(wav, min_silence_len, silence_thresh, metrics)
+        else:
+            with stage(metrics, "detect"):
+                silent_ranges = detect_silence(envelope, min_silence_len, silence_thresh)
+        for seg_start, seg_end, _, _ in speech_segments(silent_ranges, length_ms, extend_duration_begin,
+                                                        extend_duration_end):
+            segment_path = os.path.join(output_dir, f"segment_{len(segment_paths)+1}.wav")
+            first, last = ms_to_frames([seg_start, seg_end], wav.frame_rate)
+            with stage(metrics, "encode"):
+                wav.write_segment(segment_path, int(first), int(last), gain)
+            segment_paths.append(segment_path)
+    return segment_paths
+
+def split_audio_index(input_path, output_dir, min_silence_len, extend_duration_begin,
+                      extend_duration_end, volume_adjustment, silence_thresh, apply_gain=True,
+                      index_format="json", metrics=None, envelope=None):
+    # Detects the same segments as split_audio but writes no audio: output_dir/segments.<format>
+    # lists their frame offsets, padding and gain, to be read back with segment_index.SegmentReader
+    gain_db = float(volume_adjustment) if apply_gain else 0.0
+    with MappedWav(input_path) as wav:
+        length_ms = duration_ms(wav.frames, wav.frame_rate)
+        if envelope is None:
+            silent_ranges = stream_silent_ranges(wav, min_silence_len, silence_thresh, metrics)
+        else:
+            with stage(metrics, "detect"):
+                silent_ranges = detect_silence(envelope, min_silence_len, silence_thresh)
+        segments = [segment_record(i, bounds, wav.frame_rate, gain_db) for i, bounds in
+                    enumerate(speech_segments(silent_ranges, length_ms, extend_duration_begin,
+                                              extend_duration_end), start=1)]
+        with stage(metrics, "encode"):
+            write_segment_index(os.path.join(output_dir, f"segments.{index_format}"), index_format,
+                                input_path, wav, segments)
+    return segments
+
+def find_wav_files(input_dir):
+    return find_files(input_dir, (".wav",))
+
+def split_file(input_path, output_dir, params):
+    # Worker entry point for split_batch; returns the segment paths and the stage timings
+    metrics = StageMetrics()
+    segment_paths = split_audio(input_path, output_dir, metrics=metrics, **params)
+    return segment_paths, metrics.as_dict()
+
+def split_batch(input_dir, output_dir, params, workers=None, log=None, progress=None, should_stop=None):
+    # Splits every WAV file under input_dir on a process pool. Segments of dir/name.wav go
+    # to output_dir/dir/name/. params holds the split_audio keyword arguments; log, progress
+    # and should_stop work like in audio_denoiser.denoise_batch.
+    log = log or (lambda message: None)
+    progress = progress or (lambda done, total: None)
+    should_stop = should_stop or (lambda: False)
+    workers = workers or default_worker_count()
+    result = {"total": 0, "processed": 0, "cancelled": 0, "segments": 0, "errors": {}, "stages": {}}
+    records = {}
+    file_list = find_wav_files(input_dir)
+    total_files = result["total"] = len(file_list)
+    if not file_list:
+        return result
+    progress(0, total_files)
+    log(f"Splitting {total_files} files with {workers} workers")
+    tasks = []
+    for input_path in file_list:
+        rel_path = os.path.relpath(input_path, input_dir)
+        segment_dir = os.path.join(output_dir, os.path.splitext(rel_path)[0])
+        tasks.append((rel_path, split_file, input_path, segment_dir, params))
+
+    def on_done(rel_path, value, error):
+        if error is None:
+            segment_paths, records[rel_path] = value
+            result["processed"] += 1
+            result["segments"] += len(segment_paths)
+            log(f"Split {rel_path} into {len(segment_paths)} segments")
+        else:
+            result["errors"][rel_path] = str(error)
+            log(f"Error splitting {rel_path}: {error}")
+
+    result["cancelled"] = run_pool(tasks, on_done, workers, log, progress, should_stop)
+    if records:
+        result["stages"] = summarize(records)
+        log("Stage summary:")
+        for line in format_summary(result["stages"]):
+            log("  " + line)
+    return result
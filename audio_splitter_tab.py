@@ -1,18 +1,40 @@
 import os
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from pydub import AudioSegment, silence
+from audio_splitter import split_audio, split_batch, preview_split
+from batch_pool import default_worker_count
+from envelope_cache import get_envelope
+
+OUTPUT_MODES = {
+    "Segment WAV files": None,
+    "Segment index (JSON)": "json",
+    "Segment index (CSV)": "csv",
+    "Cue sheet": "cue",
+}
+
+def format_duration(ms):
+    return f"{ms // 60000}:{ms // 1000 % 60:02d}.{ms // 100 % 10}"
 
 class AudioSplitterTab:
     def __init__(self, parent):
+        self.root = parent.winfo_toplevel()
         self.frame = ttk.Frame(parent, padding=10)
+        self.processing = False
+        self.stop_event = None
+        self.envelope = None
+        self.envelope_path = None
+        self.preview_job = None
         self.build_widgets()
 
     def build_widgets(self):
         # Input File
-        ttk.Label(self.frame, text="Select Input WAV File:").grid(row=0, column=0, padx=5, pady=5)
+        self.input_label = ttk.Label(self.frame, text="Select Input WAV File:")
+        self.input_label.grid(row=0, column=0, padx=5, pady=5)
         self.input_entry = ttk.Entry(self.frame, width=50)
         self.input_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.input_entry.bind("<FocusOut>", lambda event: self.load_envelope())
+        self.input_entry.bind("<Return>", lambda event: self.load_envelope())
         ttk.Button(self.frame, text="Browse", command=self.browse_input).grid(row=0, column=2, padx=5, pady=5)
 
         # Output Directory
@@ -56,15 +78,69 @@ class AudioSplitterTab:
         self.silence_thresh_slider.set(-50)
         self.silence_thresh_slider.grid(row=6, column=1, padx=5, pady=5, sticky="w")
 
+        # Live preview of the segments the current settings produce
+        self.preview_label = ttk.Label(self.frame, text="")
+        self.preview_label.grid(row=6, column=2, padx=5, pady=5, sticky="w")
+        for slider in (self.silence_length_slider, self.extend_duration_begin_slider,
+                       self.extend_duration_end_slider, self.silence_thresh_slider):
+            slider.config(command=lambda value: self.schedule_preview())
+
+        # Streaming Mode
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.frame, text="Streaming Mode (memory-mapped, for files larger than RAM)", variable=self.streaming_var
+        ).grid(row=7, column=1, padx=5, pady=5, sticky="w")
+        self.output_mode_var = tk.StringVar(value="Segment WAV files")
+        ttk.Combobox(
+            self.frame, textvariable=self.output_mode_var, values=list(OUTPUT_MODES), state="readonly", width=22
+        ).grid(row=7, column=2, padx=5, pady=5)
+
+        # Batch Mode
+        self.batch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.frame, text="Batch Mode (split every WAV file in a directory)", variable=self.batch_var,
+            command=self.update_input_label
+        ).grid(row=8, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(self.frame, text="Parallel Workers:").grid(row=9, column=0, padx=5, pady=5)
+        self.workers = ttk.Spinbox(self.frame, from_=1, to=os.cpu_count() or 1, width=6)
+        self.workers.set(default_worker_count())
+        self.workers.grid(row=9, column=1, padx=5, pady=5, sticky="w")
+        self.sidecar_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.frame, text="Cache Analysis on Disk", variable=self.sidecar_var
+        ).grid(row=8, column=2, padx=5, pady=5, sticky="w")
+
         # Reset and Start Processing buttons
-        ttk.Button(self.frame, text="Reset to Default", command=self.reset_defaults).grid(row=7, column=1, padx=5, pady=10)
-        ttk.Button(self.frame, text="Start Processing", command=self.start_processing).grid(row=8, column=1, padx=5, pady=10)
+        ttk.Button(self.frame, text="Reset to Default", command=self.reset_defaults).grid(row=10, column=1, padx=5, pady=10)
+        self.start_btn = ttk.Button(self.frame, text="Start Processing", command=self.start_processing)
+        self.start_btn.grid(row=11, column=1, padx=5, pady=10)
+
+        # Progress and Log
+        self.progress = ttk.Progressbar(self.frame, orient=tk.HORIZONTAL, mode='determinate')
+        self.progress.grid(row=12, column=0, columnspan=3, sticky="ew", padx=5, pady=5)
+        self.log = tk.Text(self.frame, height=8, width=80)
+        self.log.grid(row=13, column=0, columnspan=3, sticky="nsew", padx=5, pady=5)
+        log_scroll = ttk.Scrollbar(self.frame, command=self.log.yview)
+        log_scroll.grid(row=13, column=3, sticky="ns")
+        self.log.configure(yscrollcommand=log_scroll.set)
+        self.frame.rowconfigure(13, weight=1)
+        self.frame.columnconfigure(1, weight=1)
+
+    def update_input_label(self):
+        if self.batch_var.get():
+            self.input_label.config(text="Select Input Directory:")
+        else:
+            self.input_label.config(text="Select Input WAV File:")
 
     def browse_input(self):
-        file_path = filedialog.askopenfilename(filetypes=[("WAV files", "*.wav")])
+        if self.batch_var.get():
+            file_path = filedialog.askdirectory()
+        else:
+            file_path = filedialog.askopenfilename(filetypes=[("WAV files", "*.wav")])
         if file_path:
             self.input_entry.delete(0, tk.END)
             self.input_entry.insert(0, file_path)
+            self.load_envelope()
 
     def browse_output(self):
         folder_path = filedialog.askdirectory()
@@ -78,42 +154,110 @@ class AudioSplitterTab:
         self.extend_duration_begin_slider.set(200)
         self.extend_duration_end_slider.set(400)
         self.volume_scale.set(0)
+        self.schedule_preview()
+
+    def load_envelope(self):
+        # Analyzes the selected file once in the background; the sliders then only re-run
+        # detection on its envelope
+        input_path = self.input_entry.get()
+        if (self.batch_var.get() or input_path == self.envelope_path
+                or not input_path.lower().endswith(".wav") or not os.path.isfile(input_path)):
+            return
+        self.preview_label.config(text="Analyzing...")
+        threading.Thread(target=self.compute_envelope, args=(input_path, self.sidecar_var.get()),
+                         daemon=True).start()
+
+    def compute_envelope(self, input_path, use_sidecar):
+        try:
+            envelope = get_envelope(input_path, use_sidecar=use_sidecar)
+        except Exception as e:
+            message = f"Analysis failed: {e}"
+            self.root.after(0, lambda: self.preview_label.config(text=message))
+            return
+        self.root.after(0, lambda: self.set_envelope(input_path, envelope))
+
+    def set_envelope(self, input_path, envelope):
+        self.envelope_path = input_path
+        self.envelope = envelope
+        self.update_preview()
+
+    def schedule_preview(self):
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(50, self.update_preview)
+
+    def update_preview(self):
+        self.preview_job = None
+        if self.envelope is None or self.envelope_path != self.input_entry.get():
+            return
+        preview = preview_split(self.envelope, int(self.silence_length_slider.get()),
+                                int(self.extend_duration_begin_slider.get()),
+                                int(self.extend_duration_end_slider.get()),
+                                int(self.silence_thresh_slider.get()))
+        self.preview_label.config(text=f"{preview['segments']} segments, "
+                                       f"{format_duration(preview['speech_ms'])} speech "
+                                       f"({format_duration(preview['total_ms'])} with padding)")
+
+    def log_message(self, message):
+        self.root.after(0, lambda: (self.log.insert(tk.END, message + "\n"),
+                                      self.log.see(tk.END)))
+
+    def update_progress(self, done, total):
+        self.root.after(0, lambda: self.progress.config(maximum=max(total, 1), value=done))
+
+    def finish_processing(self):
+        # Called from the worker thread when its run is over; only then can a new run start
+        def release():
+            self.processing = False
+            self.start_btn.config(text="Start Processing", state="normal")
+        self.root.after(0, release)
 
     def process_audio(self, input_path, output_dir, min_silence_len,
                       extend_duration_begin, extend_duration_end,
                       volume_adjustment, silence_thresh):
+        try:
+            segment_paths = split_audio(input_path, output_dir, min_silence_len,
+                                        extend_duration_begin, extend_duration_end,
+                                        volume_adjustment, silence_thresh,
+                                        apply_gain=self.apply_gain_var.get(),
+                                        streaming=self.streaming_var.get(),
+                                        index_format=OUTPUT_MODES[self.output_mode_var.get()],
+                                        envelope=self.envelope if self.envelope_path == input_path else None)
+        except Exception as e:
+            self.log_message(f"Error splitting {os.path.basename(input_path)}: {e}")
+            messagebox.showerror("Error", f"Audio splitting failed:\n{e}")
+        else:
+            self.log_message(f"Split {os.path.basename(input_path)} into {len(segment_paths)} segments")
+            messagebox.showinfo("Success", "Audio splitting complete!")
+        self.finish_processing()
 
-        audio = AudioSegment.from_wav(input_path)
-        silent_ranges = silence.detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
-        speech_segments = []
-        prev_end = 0
-
-        for start, end in silent_ranges:
-            if prev_end < start:
-                # Extend backward without going below 0 and forward without exceeding the length
-                seg_start = max(0, prev_end - extend_duration_begin)
-                seg_end = min(len(audio), start + extend_duration_end)
-                speech_segments.append(audio[seg_start:seg_end])
-            prev_end = end
-
-        if prev_end < len(audio):
-            seg_start = max(0, prev_end - extend_duration_begin)
-            seg_end = len(audio)  # Cannot extend beyond the end of the file
-            speech_segments.append(audio[seg_start:seg_end])
-
-        os.makedirs(output_dir, exist_ok=True)
-        for i, segment in enumerate(speech_segments):
-            if self.apply_gain_var.get():
-                adjusted_segment = segment.apply_gain(volume_adjustment)
+    def batch_process(self, input_dir, output_dir, params, workers, stop_event):
+        # Start is given back however the run ends
+        try:
+            result = split_batch(
+                input_dir, output_dir, params,
+                workers=workers,
+                log=self.log_message,
+                progress=self.update_progress,
+                should_stop=stop_event.is_set
+            )
+        except Exception as e:
+            messagebox.showerror("Error", f"Batch splitting failed:\n{e}")
+        else:
+            if result["total"] == 0:
+                messagebox.showinfo("Info", "No WAV files found")
             else:
-                adjusted_segment = segment
-
-            segment_path = os.path.join(output_dir, f"segment_{i+1}.wav")
-            adjusted_segment.export(segment_path, format="wav")
-
-        messagebox.showinfo("Success", "Audio splitting complete!")
+                messagebox.showinfo("Complete", f"Split {result['processed']}/{result['total']} files"
+                                                f" into {result['segments']} segments")
+        finally:
+            self.finish_processing()
 
     def start_processing(self):
+        if self.processing:
+            # Only batch runs can be stopped; the button comes back when the run's thread ends
+            self.stop_event.set()
+            self.start_btn.config(text="Stopping...", state="disabled")
+            return
         input_path = self.input_entry.get()
         output_dir = self.output_entry.get()
         try:
@@ -121,6 +265,7 @@ class AudioSplitterTab:
             extend_duration_begin = int(self.extend_duration_begin_slider.get())
             extend_duration_end = int(self.extend_duration_end_slider.get())
             silence_thresh = int(self.silence_thresh_slider.get())
+            workers = int(self.workers.get())
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for silence and extend duration.")
             return
@@ -131,6 +276,26 @@ class AudioSplitterTab:
             messagebox.showerror("Error", "Please select both input file and output directory.")
             return
 
-        self.process_audio(input_path, output_dir, min_silence_len,
-                           extend_duration_begin, extend_duration_end,
-                           volume_adjustment, silence_thresh)
+        self.processing = True
+        if self.batch_var.get():
+            self.stop_event = threading.Event()
+            self.start_btn.config(text="Stop Processing")
+            params = {
+                "min_silence_len": min_silence_len,
+                "extend_duration_begin": extend_duration_begin,
+                "extend_duration_end": extend_duration_end,
+                "volume_adjustment": volume_adjustment,
+                "silence_thresh": silence_thresh,
+                "apply_gain": self.apply_gain_var.get(),
+                "streaming": self.streaming_var.get(),
+                "index_format": OUTPUT_MODES[self.output_mode_var.get()],
+            }
+            threading.Thread(target=self.batch_process, daemon=True,
+                             args=(input_path, output_dir, params, max(1, workers), self.stop_event)).start()
+        else:
+            # A single split has no stop point, so the button stays disabled until it ends
+            self.start_btn.config(text="Processing...", state="disabled")
+            threading.Thread(target=self.process_audio, daemon=True,
+                             args=(input_path, output_dir, min_silence_len,
+                                   extend_duration_begin, extend_duration_end,
+                                   volume_adjustment, silence_thresh)).start()
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+MANIFEST_NAME = ".omnitool_manifest.json"
+SAVE_INTERVAL = 2.0
+
+def params_fingerprint(params):
+    # Stable hash of every processing parameter; arrays (e.g. noise profiles) are hashed by value
+    def encode(value):
+        if isinstance(value, np.ndarray):
+            return hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        raise TypeError(f"Cannot fingerprint {type(value).__name__}")
+    text = json.dumps(params, sort_keys=True, default=encode)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class BatchManifest:
+    """Records which inputs of a batch produced an output with which parameters.
+
+    The manifest lives in the output directory. An input is up to date when its output
+    exists and the recorded size, mtime and parameter fingerprint still match. With
+    use_hash, a file whose mtime changed but whose content hash did not is also up to date.
+    """
+
+    def __init__(self, output_dir, use_hash=False):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.use_hash = use_hash
+        self.entries = {}
+        self.last_save = time.monotonic()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError):
+                # A corrupt manifest only costs a full re-run
+                self.entries = {}
+
+    def source_signature(self, input_path):
+        stat = os.stat(input_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def is_up_to_date(self, rel_path, input_path, output_path, fingerprint):
+        entry = self.entries.get(rel_path)
+        if entry is None or entry["fingerprint"] != fingerprint or not os.path.exists(output_path):
+            return False
+        signature = self.source_signature(input_path)
+        if entry["size"] != signature["size"]:
+            return False
+        if entry["mtime_ns"] == signature["mtime_ns"]:
+            return True
+        if self.use_hash and entry.get("sha256") == file_sha256(input_path):
+            entry["mtime_ns"] = signature["mtime_ns"]
+            return True
+        return False
+
+    def record(self, rel_path, input_path, fingerprint, signature=None):
+        # Pass the signature taken before processing so edits made meanwhile are not masked
+        entry = dict(signature or self.source_signature(input_path))
+        entry["fingerprint"] = fingerprint
+        if self.use_hash:
+            entry["sha256"] = file_sha256(input_path)
+        self.entries[rel_path] = entry
+        if time.monotonic() - self.last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
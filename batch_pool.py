@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# What the batch functions (denoise, split, pipeline, table dedup) share: the default worker
+# count, finding their inputs and the process-pool loop that reports progress and cancels.
+
+def default_worker_count():
+    # Leave one core free for the GUI and the decoder threads of the main process
+    return max(1, (os.cpu_count() or 1) - 1)
+
+def find_files(input_dir, extensions):
+    # Sorted paths of the files under input_dir ending in one of the lowercase extensions;
+    # ~$name files are Office lock files
+    file_list = []
+    for root_dir, _, files in os.walk(input_dir):
+        for file in files:
+            if file.lower().endswith(tuple(extensions)) and not file.startswith("~$"):
+                file_list.append(os.path.join(root_dir, file))
+    return sorted(file_list)
+
+def run_pool(tasks, on_done, workers=None, log=None, progress=None, should_stop=None, executor=None,
+             noun="files"):
+    # Runs tasks, a list of (key, function, *args), on a process pool. As each finishes,
+    # on_done(key, result, error) is called from the calling thread (error is None on
+    # success, result None on failure), then progress(done, total). should_stop() is polled
+    # every 0.2 s and cancels the tasks that have not started. A given executor is left
+    # running for the caller. Returns the number of cancelled tasks.
+    log = log or (lambda message: None)
+    progress = progress or (lambda done, total: None)
+    should_stop = should_stop or (lambda: False)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers or default_worker_count())
+    pending = {}
+    done = cancelled = 0
+    try:
+        for key, function, *args in tasks:
+            pending[executor.submit(function, *args)] = key
+        while pending:
+            if should_stop():
+                cancelled = sum(future.cancel() for future in pending)
+                log(f"Stopped: cancelled {cancelled} pending {noun}")
+                break
+            finished, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = pending.pop(future)
+                error = future.exception()
+                on_done(key, None if error is not None else future.result(), error)
+                done += 1
+                progress(done, len(tasks))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return cancelled
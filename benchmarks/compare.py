@@ -0,0 +1,38 @@
+import sys
+import json
+import argparse
+
+# Compares two reports from benchmarks/run.py case by case:
+#   python benchmarks/compare.py before.json after.json --threshold 1.10
+# Exits with status 1 when any case got slower than the threshold allows.
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return {(r["case"], r["size"]): r for r in report["results"]}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+    regressions = 0
+    print(f"{'case':<14}{'size':>10}{'before s':>12}{'after s':>12}{'ratio':>8}{'RSS MB before/after':>24}")
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        if "error" in before or "error" in after:
+            print(f"{key[0]:<14}{key[1]:>10}  error: {before.get('error') or after.get('error')}")
+            continue
+        ratio = after["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        flag = "  REGRESSION" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        rss = f"{before['peak_rss_mb']}/{after['peak_rss_mb']}"
+        print(f"{key[0]:<14}{key[1]:>10}{before['seconds']:>12.3f}{after['seconds']:>12.3f}{ratio:>8.2f}{rss:>24}{flag}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import time
+import numpy as np
+import soundfile as sf
+
+# Deterministic synthetic inputs for the benchmarks. The same arguments always produce
+# byte-identical files, so timings from different runs and machines are comparable.
+
+WORDS = ["Haus", "Baum", "Straße", "Fenster", "Schule", "Wasser", "Tisch", "Lampe",
+         "house", "tree", "street", "window", "school", "water", "table", "lamp"]
+SENTENCES = ["Das ist ein schönes Haus.", "Wir gehen morgen in die Schule.",
+             "Der Baum steht vor dem Fenster.", "This is a beautiful house.",
+             "We are going to school tomorrow.", "The tree stands in front of the window."]
+
+def noisy_multichannel_wav(path, seconds, channels=2, sr=48000, seed=0):
+    # Tone bursts in every channel over broadband noise, with one second of leading noise
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    data = 0.02 * rng.standard_normal((len(t), channels)).astype(np.float32)
+    for c in range(channels):
+        bursts = (np.sin(2 * np.pi * 0.25 * t + c) > 0) & (t > 1.0)
+        data[:, c] += (0.3 * np.sin(2 * np.pi * (220 + 55 * c) * t) * bursts).astype(np.float32)
+    sf.write(path, data, sr, subtype='PCM_16')
+    return path
+
+def speech_silence_wav(path, seconds, sr=16000, seed=0):
+    # Alternating "speech" (modulated tones) and near-silence with random lengths
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sr)
+    data = np.zeros(total, dtype=np.float32)
+    pos = 0
+    speaking = False
+    while pos < total:
+        length = int(rng.uniform(0.3, 2.0) * sr)
+        end = min(pos + length, total)
+        n = end - pos
+        if speaking:
+            t = np.arange(n) / sr
+            data[pos:end] = 0.4 * np.sin(2 * np.pi * rng.uniform(120, 300) * t) * np.sin(np.pi * t / (n / sr))
+        else:
+            data[pos:end] = 0.0005 * rng.standard_normal(n)
+        speaking = not speaking
+        pos = end
+    sf.write(path, data, sr, subtype='PCM_16')
+    return path
+
+def duplicate_xlsx(path, rows, unique_keys=None, extra_columns=5, seed=0):
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    unique_keys = unique_keys or max(1, rows // 2)
+    frame = {"key": rng.integers(0, unique_keys, rows).astype(str)}
+    for c in range(extra_columns):
+        frame[f"col{c}"] = rng.integers(0, 1_000_000, rows)
+    frame["text"] = rng.choice(WORDS, rows)
+    pd.DataFrame(frame).to_excel(path, index=False)
+    return path
+
+def pptx_deck(path, slides, seed=0):
+    import pptx
+    rng = np.random.default_rng(seed)
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = str(rng.choice(SENTENCES))
+        lines = [str(rng.choice(WORDS)) for _ in range(4)] + [str(rng.choice(SENTENCES)), str(i)]
+        slide.placeholders[1].text = "\n".join(lines)
+    presentation.save(path)
+    return path
+
+def vocabulary_lines(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f"{rng.choice(WORDS)} {rng.choice(SENTENCES)}" for _ in range(count)]
+
+def fake_tts_engine(text, lang, fp, latency=0.0):
+    # Local stand-in for gTTS: a 24 kHz mono MP3 whose length follows the text, no network.
+    # latency simulates the HTTP round trip in seconds.
+    if latency:
+        time.sleep(latency)
+    sr = 24000
+    t = np.arange(int(sr * (0.2 + 0.05 * len(text)))) / sr
+    tone = 0.3 * np.sin(2 * np.pi * (200 + len(text) % 100) * t)
+    sf.write(fp, tone.astype(np.float32), sr, format='MP3')
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import platform
+import tempfile
+import subprocess
+
+# Benchmark suite for the five tools. Every case runs in a fresh interpreter so peak RSS
+# belongs to that case alone; fixtures are generated once into the work directory and
+# excluded from the timings. Results are written as JSON for benchmarks/compare.py.
+#
+#   python benchmarks/run.py --preset quick --output before.json
+#   python benchmarks/run.py --preset quick --output after.json
+#   python benchmarks/compare.py before.json after.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+import fixtures
+
+# case -> (unit of work, sizes per preset); sizes are seconds of audio, rows, slides or lines
+CASES = {
+    "denoise": ("audio_s", {"quick": [10, 60], "full": [10, 60, 600]}),
+    "split": ("audio_s", {"quick": [60, 600], "full": [60, 600, 3600]}),
+    "excel_dedup": ("rows", {"quick": [10000, 100000], "full": [10000, 100000, 1000000]}),
+    "excel_stream": ("rows", {"quick": [10000, 100000], "full": [10000, 100000, 1000000]}),
+    "pptx_filter": ("lines", {"quick": [20, 200], "full": [20, 200, 1000]}),
+    "tts": ("lines", {"quick": [20, 200], "full": [20, 200, 2000]}),
+    "tts_latency": ("lines", {"quick": [20, 200], "full": [20, 200, 2000]}),
+}
+
+# tts_latency gives the stand-in engine a network round trip and runs it concurrently
+TTS_LATENCY_S = 0.05
+TTS_WORKERS = 8
+
+def fixture_path(workdir, case, size):
+    extension = {"denoise": "wav", "split": "wav", "excel_dedup": "xlsx", "excel_stream": "xlsx", "pptx_filter": "pptx", "tts": "txt",
+                 "tts_latency": "txt"}
+    return os.path.join(workdir, f"{case}_{size}.{extension[case]}")
+
+def prepare(case, size, workdir):
+    path = fixture_path(workdir, case, size)
+    if os.path.exists(path):
+        return path
+    if case == "denoise":
+        fixtures.noisy_multichannel_wav(path, size, channels=2)
+    elif case == "split":
+        fixtures.speech_silence_wav(path, size)
+    elif case in ("excel_dedup", "excel_stream"):
+        fixtures.duplicate_xlsx(path, size)
+    elif case == "pptx_filter":
+        fixtures.pptx_deck(path, size)
+    elif case in ("tts", "tts_latency"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(fixtures.vocabulary_lines(size)))
+    return path
+
+def run_case(case, size, workdir):
+    # Returns (seconds, units of work) for the timed part only
+    path = fixture_path(workdir, case, size)
+    output = os.path.join(workdir, "out", f"{case}_{size}")
+    os.makedirs(output, exist_ok=True)
+    if case == "denoise":
+        from audio_denoiser import denoise_file
+        import soundfile as sf
+        start = time.perf_counter()
+        denoise_file(path, os.path.join(output, "denoised.wav"), 0, 1000, 3)
+        return time.perf_counter() - start, sf.info(path).duration
+    if case == "split":
+        from audio_splitter import split_audio
+        import soundfile as sf
+        start = time.perf_counter()
+        split_audio(path, output, 550, 200, 400, 0, -50)
+        return time.perf_counter() - start, sf.info(path).duration
+    if case in ("excel_dedup", "excel_stream"):
+        from excel_duplicate_remover import remove_duplicates
+        start = time.perf_counter()
+        result = remove_duplicates(path, os.path.join(output, "deduped.xlsx"), "key",
+                                   streaming=case == "excel_stream")
+        return time.perf_counter() - start, result["rows_in"]
+    if case == "pptx_filter":
+        from powerpoint_text_extractor import extract_text_from_pptx, filter_text_by_language
+        texts = extract_text_from_pptx(path)
+        lines = sum(len(text.split("\n")) for text in texts)
+        start = time.perf_counter()
+        filter_text_by_language(texts, "de", filter_numeric=True, threshold=5)
+        return time.perf_counter() - start, lines
+    if case in ("tts", "tts_latency"):
+        from text_to_speech import convert_lines
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        errors = []
+        if case == "tts":
+            engine, workers = fixtures.fake_tts_engine, 1
+        else:
+            engine = functools.partial(fixtures.fake_tts_engine, latency=TTS_LATENCY_S)
+            workers = TTS_WORKERS
+        start = time.perf_counter()
+        convert_lines(lines, output, "wav", engine=engine, workers=workers,
+                      on_error=lambda i, message: errors.append(message))
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {len(lines)} lines failed, first: {errors[0]!r}")
+        return elapsed, len(lines)
+    raise ValueError(f"Unknown case: {case}")
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def child_main(case, size, workdir):
+    seconds, work = run_case(case, size, workdir)
+    print(json.dumps({"seconds": seconds, "work": work, "peak_rss_mb": peak_rss_mb()}))
+
+def run_in_child(case, size, workdir):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", case, str(size), "--workdir", workdir],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+    measured = json.loads(completed.stdout.strip().splitlines()[-1])
+    unit = CASES[case][0]
+    return {
+        "seconds": round(measured["seconds"], 6),
+        "throughput": round(measured["work"] / measured["seconds"], 3) if measured["seconds"] else None,
+        "throughput_unit": f"{unit}/s",
+        "peak_rss_mb": measured["peak_rss_mb"],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the OmniTool Suite processing code")
+    parser.add_argument("--preset", choices=("quick", "full"), default="quick")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument("--workdir", help="fixture and output directory (kept between runs)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "omnitool_bench")
+    os.makedirs(workdir, exist_ok=True)
+    if args.child:
+        child_main(args.child[0], int(args.child[1]), workdir)
+        return
+    results = []
+    for case in args.cases:
+        unit, presets = CASES[case]
+        for size in presets[args.preset]:
+            prepare(case, size, workdir)
+            entry = {"case": case, "size": size, "size_unit": unit}
+            entry.update(run_in_child(case, size, workdir))
+            results.append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+    report = {
+        "meta": {
+            "preset": args.preset,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
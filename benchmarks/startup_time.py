@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Measures the wall-clock time from launching a fresh interpreter to the first drawn
+# window of the GUI ("window") and to the first tab being usable ("ready"), with the tabs
+# built lazily (the default) and eagerly (every tab module imported and built before the
+# window appears, as main.py used to do). In lazy mode the window is drawn with
+# placeholders before the idle callback loads the first tab, so "window" is taken as that
+# callback starts; in eager mode both are taken after the first update.
+# Run from anywhere: python benchmarks/startup_time.py --runs 5
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_CODE = """
+import sys
+import tkinter as tk
+import main
+def mark(name):
+    sys.stdout.write(name + "\\n")
+    sys.stdout.flush()
+load_selected_tab = main.OmniToolSuite.load_selected_tab
+def timed_load(self):
+    if not self.lazy_marked:
+        self.lazy_marked = True
+        mark("window")
+    load_selected_tab(self)
+main.OmniToolSuite.lazy_marked = False
+main.OmniToolSuite.load_selected_tab = timed_load
+root = tk.Tk()
+app = main.OmniToolSuite(root, lazy={lazy})
+root.update()
+if not app.lazy_marked:
+    mark("window")
+mark("ready")
+root.destroy()
+"""
+
+def time_to_first_window(lazy):
+    # Returns the seconds to the "window" and "ready" marks of one fresh GUI process
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", CHILD_CODE.format(lazy=lazy)],
+                             cwd=REPO_DIR, stdout=subprocess.PIPE, text=True)
+    marks = {}
+    for line in child.stdout:
+        marks[line.strip()] = time.perf_counter() - start
+    child.wait()
+    if set(marks) != {"window", "ready"}:
+        raise RuntimeError("GUI process exited before showing its window")
+    return marks
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time to first window and first tab, lazy vs eager tabs")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    report = {}
+    for mode, lazy in (("eager", False), ("lazy", True)):
+        # The first run warms the OS file cache and is not counted
+        time_to_first_window(lazy)
+        samples = [time_to_first_window(lazy) for _ in range(args.runs)]
+        report[mode] = {}
+        for name in ("window", "ready"):
+            times = [sample[name] for sample in samples]
+            report[mode][name] = {"median_s": round(statistics.median(times), 4),
+                                  "samples_s": [round(t, 4) for t in times]}
+    report["speedup"] = {name: round(report["eager"][name]["median_s"] / report["lazy"][name]["median_s"], 2)
+                         for name in ("window", "ready")}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
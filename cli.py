@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from instrumentation import StageMetrics, summarize, write_metrics
+
+# Headless entry point for the tools behind the GUI tabs. Tool modules are imported inside
+# each command so a command only loads its own dependencies, and tkinter is never imported.
+
+def stage_results(args, item, metrics, results):
+    # Adds the per-stage summary of a single-input command and writes --metrics if given
+    records = {item: metrics.as_dict()}
+    if args.metrics:
+        write_metrics(args.metrics, records)
+    results["stages"] = summarize(records)
+    return results
+
+def run_denoise(args):
+    from audio_denoiser import denoise_batch
+    from noise_profiles import load_noise_profile
+    params = {
+        "prop_decrease": args.prop_decrease,
+        "n_fft": args.n_fft,
+        "win_length": args.win_length,
+        "hop_length": args.hop_length,
+        "filter_order": args.filter_order,
+        "lowcut": args.low_cut,
+        "highcut": args.high_cut,
+        "preserve_bit_depth": args.bit_depth == 32,
+        "streaming": args.streaming,
+        "float32": args.float32,
+        "noise_profile": load_noise_profile(args.noise_profile) if args.noise_profile else None,
+    }
+    log = None if args.json else print
+    return denoise_batch(args.input_dir, args.output_dir, args.noise_start, args.noise_end,
+                         args.boost, params, workers=args.workers, resume=not args.no_resume,
+                         use_hash=args.hash, log=log, track_memory=args.track_memory,
+                         metrics_path=args.metrics)
+
+def run_split(args):
+    from audio_splitter import split_audio, split_batch, preview_split
+    if args.preview:
+        from envelope_cache import get_envelope
+        envelope = get_envelope(args.input_file, use_sidecar=args.cache_envelope)
+        return preview_split(envelope, args.min_silence_len, args.extend_begin, args.extend_end,
+                             args.silence_thresh)
+    if os.path.isdir(args.input_file):
+        params = {
+            "min_silence_len": args.min_silence_len,
+            "extend_duration_begin": args.extend_begin,
+            "extend_duration_end": args.extend_end,
+            "volume_adjustment": args.volume,
+            "silence_thresh": args.silence_thresh,
+            "apply_gain": not args.no_gain,
+            "streaming": args.streaming,
+            "index_format": args.index,
+        }
+        return split_batch(args.input_file, args.output_dir, params, workers=args.workers,
+                           log=None if args.json else print)
+    metrics = StageMetrics(args.track_memory)
+    segment_paths = split_audio(args.input_file, args.output_dir, args.min_silence_len,
+                                args.extend_begin, args.extend_end, args.volume,
+                                args.silence_thresh, apply_gain=not args.no_gain, metrics=metrics,
+                                streaming=args.streaming, index_format=args.index)
+    return stage_results(args, args.input_file, metrics, {"segments": segment_paths})
+
+def run_pipeline(args):
+    from audio_pipeline import pipeline_batch
+    from noise_profiles import load_noise_profile
+    config = {"denoise": None, "split": None, "format": args.format, "bit_depth": args.bit_depth}
+    if not args.no_denoise:
+        config["denoise"] = {
+            "noise_start": args.noise_start,
+            "noise_end": args.noise_end,
+            "volume_boost": args.boost,
+            "prop_decrease": args.prop_decrease,
+            "lowcut": args.low_cut,
+            "highcut": args.high_cut,
+            "n_fft": args.n_fft,
+            "win_length": args.win_length,
+            "hop_length": args.hop_length,
+            "filter_order": args.filter_order,
+            "float32": args.float32,
+            "noise_profile": load_noise_profile(args.noise_profile) if args.noise_profile else None,
+        }
+    if not args.no_split:
+        config["split"] = {
+            "min_silence_len": args.min_silence_len,
+            "silence_thresh": args.silence_thresh,
+            "extend_duration_begin": args.extend_begin,
+            "extend_duration_end": args.extend_end,
+            "volume_adjustment": args.volume,
+            "apply_gain": not args.no_gain,
+        }
+    return pipeline_batch(args.input_dir, args.output_dir, config, workers=args.workers,
+                          log=None if args.json else print, track_memory=args.track_memory,
+                          metrics_path=args.metrics)
+
+def run_tts(args):
+    from text_to_speech import convert_entries, line_entries, file_entries
+    from tts_cache import TTSCache
+    # The input is streamed, so the written files are counted rather than listed
+    if args.input_file == "-":
+        entries = line_entries(sys.stdin, args.lang)
+    else:
+        entries = file_entries(args.input_file, args.lang, args.text_column, args.key_column,
+                               args.lang_column)
+    errors = {}
+    metrics = StageMetrics(args.track_memory)
+    cache = None if args.no_cache else TTSCache(max_bytes=args.cache_size * 1024 * 1024)
+    written = convert_entries(entries, args.output_dir, args.format,
+                              on_error=lambda i, message: errors.__setitem__(i, message),
+                              metrics=metrics, workers=args.workers, rate_limit=args.rate_limit,
+                              retries=args.retries, cache=cache, log=None if args.json else print)
+    results = {"written": written, "errors": errors}
+    if cache is not None:
+        results["cache"] = cache.stats()
+    return stage_results(args, args.input_file, metrics, results)
+
+def run_pptx_extract(args):
+    from powerpoint_text_extractor import ensure_nltk_data, extract_to_folder
+    ensure_nltk_data()
+    metrics = StageMetrics(args.track_memory)
+    sentences, words = extract_to_folder(args.input_file, args.output_dir, args.lang,
+                                         not args.no_separate, not args.keep_numeric,
+                                         args.threshold, not args.no_detect, metrics=metrics)
+    return stage_results(args, args.input_file, metrics,
+                         {"sentences": len(sentences), "words": len(words)})
+
+def run_excel_dedup(args):
+    from excel_duplicate_remover import remove_duplicates, dedup_batch
+    if os.path.isdir(args.input_file) or args.all_sheets:
+        if args.streaming:
+            raise ValueError("--streaming works on a single sheet only")
+        log = None if args.json else print
+        return dedup_batch(args.input_file, args.output_file, args.column, normalizers=args.normalize or (),
+                           merge=args.merge, all_sheets=args.all_sheets, workers=args.workers,
+                           index_mb=args.spill_mb, log=log)
+    return remove_duplicates(args.input_file, args.output_file, args.column, streaming=args.streaming,
+                             use_cache=args.cache, normalizers=args.normalize or (), index_mb=args.spill_mb)
+
+def run_excel_analyze(args):
+    from excel_duplicate_remover import analyze_table
+    return analyze_table(args.input_file, normalizers=args.normalize or (), top=args.top,
+                         approximate=args.approximate, use_cache=args.cache)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="omnitool", description="OmniTool Suite without the GUI")
+    parser.add_argument("--json", action="store_true", help="print results and timings as JSON")
+    parser.add_argument("--metrics", metavar="PATH", help="write per-stage timings to a .json or .csv file")
+    parser.add_argument("--track-memory", action="store_true", help="record peak memory per stage (slower)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    denoise = commands.add_parser("denoise", help="denoise every audio file under a directory")
+    denoise.add_argument("input_dir")
+    denoise.add_argument("output_dir")
+    denoise.add_argument("--noise-start", type=float, default=0.0, help="noise sample start (ms)")
+    denoise.add_argument("--noise-end", type=float, default=1000.0, help="noise sample end (ms)")
+    denoise.add_argument("--boost", type=float, default=3.0, help="volume boost (dB)")
+    denoise.add_argument("--prop-decrease", type=float, default=1.0)
+    denoise.add_argument("--n-fft", type=int, default=2048)
+    denoise.add_argument("--win-length", type=int, default=2048)
+    denoise.add_argument("--hop-length", type=int, default=512)
+    denoise.add_argument("--filter-order", type=int, default=6)
+    denoise.add_argument("--low-cut", type=float, default=80.0)
+    denoise.add_argument("--high-cut", type=float, default=16000.0)
+    denoise.add_argument("--bit-depth", type=int, choices=(16, 32), default=32)
+    denoise.add_argument("--streaming", action="store_true", help="constant-memory block processing")
+    denoise.add_argument("--float32", action="store_true", help="keep the pipeline in float32")
+    denoise.add_argument("--noise-profile", help="name of a saved noise profile")
+    denoise.add_argument("--workers", type=int, default=None)
+    denoise.add_argument("--no-resume", action="store_true", help="reprocess up-to-date files")
+    denoise.add_argument("--hash", action="store_true", help="verify changed files by content hash")
+    denoise.set_defaults(func=run_denoise)
+
+    split = commands.add_parser("split", help="split a WAV file, or every WAV file in a directory, on silence")
+    split.add_argument("input_file", help="WAV file or directory")
+    split.add_argument("output_dir")
+    split.add_argument("--min-silence-len", type=int, default=550, help="ms")
+    split.add_argument("--extend-begin", type=int, default=200, help="ms")
+    split.add_argument("--extend-end", type=int, default=400, help="ms")
+    split.add_argument("--volume", type=float, default=0.0, help="volume adjustment (dB)")
+    split.add_argument("--no-gain", action="store_true", help="do not apply the volume adjustment")
+    split.add_argument("--silence-thresh", type=int, default=-50, help="dBFS")
+    split.add_argument("--streaming", action="store_true", help="memory-map the file instead of loading it")
+    split.add_argument("--workers", type=int, default=None, help="parallel files for a directory")
+    split.add_argument("--index", choices=("json", "csv", "cue"), help="write only a segment index in this format")
+    split.add_argument("--preview", action="store_true", help="only report the segment count and durations")
+    split.add_argument("--cache-envelope", action="store_true", help="keep the file analysis on disk for --preview")
+    split.set_defaults(func=run_split)
+
+    pipeline = commands.add_parser("pipeline", help="denoise, split and encode every audio file under a directory in one pass")
+    pipeline.add_argument("input_dir")
+    pipeline.add_argument("output_dir")
+    pipeline.add_argument("--no-denoise", action="store_true", help="skip the denoise stage")
+    pipeline.add_argument("--noise-start", type=float, default=0.0, help="noise sample start (ms)")
+    pipeline.add_argument("--noise-end", type=float, default=1000.0, help="noise sample end (ms)")
+    pipeline.add_argument("--boost", type=float, default=3.0, help="volume boost (dB)")
+    pipeline.add_argument("--prop-decrease", type=float, default=1.0)
+    pipeline.add_argument("--n-fft", type=int, default=2048)
+    pipeline.add_argument("--win-length", type=int, default=2048)
+    pipeline.add_argument("--hop-length", type=int, default=512)
+    pipeline.add_argument("--filter-order", type=int, default=6)
+    pipeline.add_argument("--low-cut", type=float, default=80.0)
+    pipeline.add_argument("--high-cut", type=float, default=16000.0)
+    pipeline.add_argument("--float32", action="store_true", help="keep the denoise stage in float32")
+    pipeline.add_argument("--noise-profile", help="name of a saved noise profile")
+    pipeline.add_argument("--no-split", action="store_true", help="skip the split stage")
+    pipeline.add_argument("--min-silence-len", type=int, default=550, help="ms")
+    pipeline.add_argument("--extend-begin", type=int, default=200, help="ms")
+    pipeline.add_argument("--extend-end", type=int, default=400, help="ms")
+    pipeline.add_argument("--volume", type=float, default=0.0, help="volume adjustment (dB)")
+    pipeline.add_argument("--no-gain", action="store_true", help="do not apply the volume adjustment")
+    pipeline.add_argument("--silence-thresh", type=int, default=-50, help="dBFS")
+    pipeline.add_argument("--format", choices=("wav", "flac", "mp3"), default="wav")
+    pipeline.add_argument("--bit-depth", type=int, choices=(16, 32), default=16)
+    pipeline.add_argument("--workers", type=int, default=None)
+    pipeline.set_defaults(func=run_pipeline)
+
+    tts = commands.add_parser("tts", help="convert each line of a text file to an audio file")
+    tts.add_argument("input_file", help="UTF-8 text or .csv file, or - for stdin")
+    tts.add_argument("output_dir")
+    tts.add_argument("--format", choices=("wav", "m4a", "mp3"), default="wav")
+    tts.add_argument("--lang", default="de")
+    tts.add_argument("--text-column", help="CSV column with the text (default: the first)")
+    tts.add_argument("--key-column", help="CSV column that names the output files")
+    tts.add_argument("--lang-column", help="CSV column with a per-row language")
+    tts.add_argument("--workers", type=int, default=4, help="lines synthesized at the same time")
+    tts.add_argument("--rate-limit", type=float, default=5.0, help="engine requests per second (0 for no limit)")
+    tts.add_argument("--no-cache", action="store_true", help="always synthesize, do not use the TTS cache")
+    tts.add_argument("--cache-size", type=float, default=500, help="TTS cache limit (MB)")
+    tts.add_argument("--retries", type=int, default=2, help="retries of a failed request, with exponential backoff")
+    tts.set_defaults(func=run_tts)
+
+    pptx = commands.add_parser("pptx-extract", help="extract sentences and words from a PPTX file")
+    pptx.add_argument("input_file")
+    pptx.add_argument("output_dir")
+    pptx.add_argument("--lang", default="de")
+    pptx.add_argument("--no-separate", action="store_true", help="write a single text.txt")
+    pptx.add_argument("--keep-numeric", action="store_true", help="keep lines with only numbers")
+    pptx.add_argument("--threshold", type=int, default=5, help="minimum characters for detection")
+    pptx.add_argument("--no-detect", action="store_true", help="disable language detection")
+    pptx.set_defaults(func=run_pptx_extract)
+
+    excel = commands.add_parser("excel-dedup", help="remove rows with a duplicate key column (.xlsx, .xls, .csv or .parquet)")
+    excel.add_argument("input_file", help="a table, or a directory to dedup across all its tables")
+    excel.add_argument("output_file", help="output file, or output directory for a batch without --merge")
+    excel.add_argument("--column", required=True, action="append",
+                       help="key column; repeat for a key made of several columns")
+    excel.add_argument("--normalize", action="append", choices=("nfkc", "casefold", "spaces", "strip"),
+                       help="normalize text keys before comparing; repeatable")
+    excel.add_argument("--spill-mb", type=float, metavar="MB",
+                       help="move the key index to a temporary SQLite file above this size")
+    excel.add_argument("--cache", action="store_true", help="keep the parsed workbook for later runs on other columns")
+    excel.add_argument("--streaming", action="store_true", help="constant-memory row-by-row pass (.xlsx only)")
+    excel.add_argument("--all-sheets", action="store_true", help="dedup every sheet of each workbook, not only the first")
+    excel.add_argument("--merge", action="store_true", help="write a batch to one merged file")
+    excel.add_argument("--workers", type=int, help="worker processes for a batch (default: CPU count - 1)")
+    excel.set_defaults(func=run_excel_dedup)
+
+    analyze = commands.add_parser("excel-analyze", help="report the duplicates each column would remove, writing nothing")
+    analyze.add_argument("input_file")
+    analyze.add_argument("--normalize", action="append", choices=("nfkc", "casefold", "spaces", "strip"),
+                         help="normalize text keys before comparing; repeatable")
+    analyze.add_argument("--top", type=int, default=5, help="most repeated keys to list per column")
+    analyze.add_argument("--approximate", action="store_true",
+                         help="HyperLogLog distinct counts without top keys, for very wide sheets")
+    analyze.add_argument("--cache", action="store_true", help="keep the parsed workbook for later runs")
+    analyze.set_defaults(func=run_excel_analyze)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    try:
+        results = args.func(args)
+        error = None
+    except Exception as e:
+        results = None
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps({
+            "command": args.command,
+            "ok": error is None,
+            "error": error,
+            "results": results,
+            "timings": {"total_s": round(elapsed, 6)},
+        }, indent=2))
+    elif error is not None:
+        print(f"Error: {error}", file=sys.stderr)
+    else:
+        print(json.dumps(results, indent=2))
+        print(f"Finished {args.command} in {elapsed:.2f} s")
+    return 0 if error is None else 1
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
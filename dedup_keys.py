@@ -0,0 +1,258 @@
+import os
+import math
+import sqlite3
+import numbers
+import hashlib
+import datetime
+import tempfile
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Duplicate detection on 64-bit row hashes instead of key values. Every key column is
+# factorized, its distinct values are normalized and hashed once, and the per-row hashes
+# of the key columns are mixed into one. Each key carries a second, independent 64-bit
+# hash that is only compared when two rows share the first one, so a collision of the
+# first hash never merges two different keys. KeyIndex remembers the keys seen so far in
+# sorted arrays, or, given a memory budget, moves them to a SQLite file beyond it.
+
+NORMALIZERS = {
+    "nfkc": lambda text: unicodedata.normalize("NFKC", text),
+    "casefold": str.casefold,
+    "spaces": lambda text: " ".join(text.split()),
+    "strip": str.strip,
+}
+KEY_BYTES = 16  # primary and check hash
+DEFAULT_INDEX_MB = 256
+SPILL_BATCH_ROWS = 100000
+HLL_PRECISION = 14  # 2**14 registers, about 0.8% standard error
+
+def normalize(value, normalizers):
+    # Normalizers apply to text only and always in NORMALIZERS order
+    if isinstance(value, str):
+        for name in NORMALIZERS:
+            if name in normalizers:
+                value = NORMALIZERS[name](value)
+    return value
+
+def value_token(value):
+    # Values pandas compares as equal get the same token: 1, 1.0 and True, or any two
+    # empty/NaN/NaT cells
+    if value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return "n:"
+    if isinstance(value, (numbers.Number, np.bool_)) and not isinstance(value, complex):
+        if isinstance(value, (np.floating, float)) and math.isnan(value):
+            return "n:"
+        return f"i:{int(value)}" if float(value).is_integer() else f"f:{float(value)!r}"
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return f"d:{value.isoformat()}"
+    return f"s:{value}"
+
+def token_hashes(tokens):
+    digests = b"".join(hashlib.blake2b(token.encode("utf-8", "surrogatepass"), digest_size=KEY_BYTES).digest()
+                       for token in tokens)
+    pairs = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+def factorize_column(values):
+    # Numeric and datetime columns are factorized natively; their uniques come back as
+    # Python ints/floats and Timestamps, which value_token expects
+    if not isinstance(values, pd.Series):
+        values = np.asarray(values)
+        values = pd.Series(values, dtype=values.dtype, copy=False)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes, uniques, values
+
+def value_hashes(values, normalizers=()):
+    # (primary, check) hashes of every value in a column; the per-value work is done once
+    # per distinct value
+    codes, uniques, _ = factorize_column(values)
+    primary, check = token_hashes(value_token(normalize(value, normalizers)) for value in uniques)
+    return primary[codes], check[codes]
+
+def column_cardinality(values, normalizers=(), top=5):
+    # Exact distinct count of a column and its most repeated values as [(value, count)],
+    # with the same key equality as value_hashes
+    codes, uniques, values = factorize_column(values)
+    if normalizers:
+        # Merge the values that normalize to the same key; codes stay in order of first appearance
+        group_codes, _ = pd.factorize(np.array([value_token(normalize(value, normalizers)) for value in uniques],
+                                               dtype=object))
+        codes = group_codes[codes]
+    counts = np.bincount(codes)
+    repeated = np.flatnonzero(counts > 1)
+    order = repeated[np.argsort(-counts[repeated], kind="stable")][:top]
+    # Each top key is shown as its first row's value
+    return len(counts), [(values.iloc[int(np.argmax(codes == code))], int(counts[code])) for code in order]
+
+def estimate_hashes(values):
+    # 64-bit hash per value for distinct-count estimates, without a hash table. Numbers and
+    # datetimes hash their bits; other values use Python's hash, which strings cache, so it
+    # is only stable within one process.
+    values = np.asarray(values)
+    if values.dtype.kind in "iub":
+        bits = values.astype(np.int64).view(np.uint64)
+    elif values.dtype.kind == "f":
+        # + 0.0 turns -0.0 into 0.0
+        bits = (values.astype(np.float64) + 0.0).view(np.uint64)
+    elif values.dtype.kind in "mM":
+        bits = values.view(np.int64).view(np.uint64)
+    else:
+        bits = np.fromiter(map(hash, values), dtype=np.int64, count=len(values)).view(np.uint64)
+        # hash() of NaN differs per object
+        bits[pd.isna(values)] = 0
+    with np.errstate(over="ignore"):
+        return mix64(bits)
+
+def approximate_distinct(values, precision=HLL_PRECISION):
+    # HyperLogLog estimate of the distinct count: one hash per row and 2**precision one-byte
+    # registers, so memory stays fixed however many distinct values the column has
+    values = np.asarray(values)
+    if not len(values):
+        return 0
+    hashes = estimate_hashes(values)
+    registers_count = 1 << precision
+    buckets = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Rank is the position of the highest set bit of the remaining bits, counted from the top
+    ranks = (64 - precision + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.int8)
+    registers = np.zeros(registers_count, dtype=np.int8)
+    np.maximum.at(registers, buckets, ranks)
+    alpha = 0.7213 / (1 + 1.079 / registers_count)
+    estimate = alpha * registers_count ** 2 / np.exp2(-registers.astype(np.float64)).sum()
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * registers_count and zeros:
+        # Linear counting is more accurate for small counts
+        estimate = registers_count * math.log(registers_count / zeros)
+    return min(int(round(estimate)), len(values))
+
+def mix64(x):
+    # splitmix64 finalizer; uint64 arithmetic wraps
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def key_hashes(columns, normalizers=()):
+    # (primary, check) uint64 hashes of the composite key formed by columns, one array or
+    # Series per key column
+    primary = check = None
+    with np.errstate(over="ignore"):
+        for column in columns:
+            column_primary, column_check = value_hashes(column, normalizers)
+            if primary is None:
+                primary, check = column_primary.copy(), column_check.copy()
+            else:
+                # Mixing the running hash before folding the column in keeps the order of the
+                # columns significant: (x, y) and (y, x) differ, and (x, x) does not cancel out
+                primary = mix64(mix64(primary) ^ column_primary)
+                check = mix64(mix64(check ^ np.uint64(0x9E3779B97F4A7C15)) ^ column_check)
+    return primary, check
+
+def index_max_keys(memory_mb):
+    if memory_mb is None:
+        return None
+    return max(1, int(memory_mb * 1024 * 1024) // KEY_BYTES)
+
+class KeyIndex:
+    # First-seen set of (primary, check) keys. first_seen() takes the keys of a batch of
+    # rows and returns the mask of rows whose key was not seen before, in an earlier batch
+    # or earlier in the same one, which is drop_duplicates(keep='first') over all batches.
+    def __init__(self, max_keys=None, spill_dir=None):
+        self.max_keys = max_keys  # None keeps the index in memory
+        self.spill_dir = spill_dir
+        self.primary = np.zeros(0, dtype=np.uint64)  # sorted
+        self.check = np.zeros(0, dtype=np.uint64)
+        self.count = 0
+        self.db = None
+        self.db_path = None
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def spilled(self):
+        return self.db is not None
+
+    def first_seen(self, primary, check):
+        primary = np.asarray(primary, dtype=np.uint64)
+        check = np.asarray(check, dtype=np.uint64)
+        mask = ~pd.DataFrame({"p": primary, "c": check}).duplicated(keep="first").to_numpy()
+        rows = np.flatnonzero(mask)
+        if self.db is None and self.max_keys is not None and self.count + len(rows) > self.max_keys:
+            self.spill()
+        if self.db is not None:
+            new = self.db_insert(primary[rows], check[rows])
+        else:
+            new = ~self.contains(primary[rows], check[rows])
+            self.insert(primary[rows][new], check[rows][new])
+        mask[rows[~new]] = False
+        self.count += int(new.sum())
+        return mask
+
+    def contains(self, primary, check):
+        found = np.zeros(len(primary), dtype=bool)
+        if not self.count or not len(primary):
+            return found
+        lo = np.searchsorted(self.primary, primary, side="left")
+        hi = np.searchsorted(self.primary, primary, side="right")
+        single = hi - lo == 1
+        found[single] = self.check[lo[single]] == check[single]
+        # Several stored keys share this primary hash, a real 64-bit collision
+        for i in np.flatnonzero(hi - lo > 1):
+            found[i] = bool((self.check[lo[i]:hi[i]] == check[i]).any())
+        return found
+
+    def insert(self, primary, check):
+        order = np.argsort(primary, kind="stable")
+        primary, check = primary[order], check[order]
+        positions = np.searchsorted(self.primary, primary)
+        self.primary = np.insert(self.primary, positions, primary)
+        self.check = np.insert(self.check, positions, check)
+
+    def spill(self):
+        # Moves the index into a SQLite file; it stays there until close()
+        fd, self.db_path = tempfile.mkstemp(suffix=".sqlite", prefix="dedup_keys_", dir=self.spill_dir)
+        os.close(fd)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE keys (p INTEGER, c INTEGER, PRIMARY KEY (p, c)) WITHOUT ROWID;
+            CREATE TEMP TABLE batch (row INTEGER, p INTEGER, c INTEGER);
+        """)
+        for start in range(0, len(self.primary), SPILL_BATCH_ROWS):
+            stop = start + SPILL_BATCH_ROWS
+            self.db.executemany("INSERT INTO keys VALUES (?, ?)",
+                                zip(self.primary[start:stop].view(np.int64).tolist(),
+                                    self.check[start:stop].view(np.int64).tolist()))
+        self.primary = np.zeros(0, dtype=np.uint64)
+        self.check = np.zeros(0, dtype=np.uint64)
+
+    def db_insert(self, primary, check):
+        # The batch keys are distinct, so NOT EXISTS against the stored keys decides each row
+        new = np.zeros(len(primary), dtype=bool)
+        for start in range(0, len(primary), SPILL_BATCH_ROWS):
+            stop = start + SPILL_BATCH_ROWS
+            self.db.execute("DELETE FROM batch")
+            self.db.executemany("INSERT INTO batch VALUES (?, ?, ?)",
+                                zip(range(start, min(stop, len(primary))),
+                                    primary[start:stop].view(np.int64).tolist(),
+                                    check[start:stop].view(np.int64).tolist()))
+            rows = [row for (row,) in self.db.execute(
+                "SELECT row FROM batch WHERE NOT EXISTS "
+                "(SELECT 1 FROM keys WHERE keys.p = batch.p AND keys.c = batch.c)")]
+            new[rows] = True
+            self.db.execute("INSERT OR IGNORE INTO keys SELECT p, c FROM batch")
+        return new
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+            os.remove(self.db_path)
@@ -0,0 +1,62 @@
+import os
+from functools import lru_cache
+import numpy as np
+from batch_manifest import file_sha256
+from silence_detection import envelope_blocks, energy_dtype
+from wav_mmap import MappedWav
+
+# The energy envelope depends only on the file, not on the splitter settings, so it is
+# computed once and reused while thresholds and lengths are tuned: in memory per path,
+# size and mtime, and optionally on disk as an .npz named by the file's SHA-256.
+
+ENVELOPE_DIR = os.path.join(os.path.expanduser("~"), ".omnitoolsuite", "envelopes")
+ENVELOPE_CACHE_SIZE = 8
+
+def wav_envelope(path):
+    # Same envelope as silence_detection.energy_envelope(AudioSegment.from_wav(path)),
+    # computed from the memory-mapped file
+    with MappedWav(path) as wav:
+        blocks = envelope_blocks(wav.read, wav.frames, wav.channels, wav.frame_rate, wav.sample_width)
+        energy = np.concatenate([np.zeros(0, dtype=energy_dtype(wav.sample_width))] + list(blocks))
+        return {
+            "energy": energy,
+            "frames": wav.frames,
+            "channels": wav.channels,
+            "frame_rate": wav.frame_rate,
+            "sample_width": wav.sample_width,
+        }
+
+def save_envelope(path, envelope):
+    temp_path = path[:-len(".npz")] + ".tmp.npz"
+    np.savez(temp_path, **envelope)
+    os.replace(temp_path, path)
+
+def load_envelope(path):
+    with np.load(path) as data:
+        return {
+            "energy": data["energy"],
+            "frames": int(data["frames"]),
+            "channels": int(data["channels"]),
+            "frame_rate": int(data["frame_rate"]),
+            "sample_width": int(data["sample_width"]),
+        }
+
+@lru_cache(maxsize=ENVELOPE_CACHE_SIZE)
+def cached_envelope(path, size, mtime_ns, use_sidecar, directory):
+    if not use_sidecar:
+        return wav_envelope(path)
+    sidecar = os.path.join(directory, file_sha256(path) + ".npz")
+    if os.path.exists(sidecar):
+        try:
+            return load_envelope(sidecar)
+        except (OSError, ValueError, KeyError):
+            pass
+    envelope = wav_envelope(path)
+    os.makedirs(directory, exist_ok=True)
+    save_envelope(sidecar, envelope)
+    return envelope
+
+def get_envelope(path, use_sidecar=False, directory=ENVELOPE_DIR):
+    # The returned envelope is shared through the cache and must not be modified
+    stat = os.stat(path)
+    return cached_envelope(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, use_sidecar, directory)
@@ -0,0 +1,392 @@
+import os
+import csv
+import hashlib
+import tempfile
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+from batch_manifest import file_sha256
+from dedup_keys import KeyIndex, key_hashes, index_max_keys, column_cardinality, approximate_distinct
+from instrumentation import StageMetrics, stage, summarize, format_summary
+from batch_pool import default_worker_count, find_files, run_pool
+
+STREAM_CHUNK_ROWS = 10000
+NA_STRINGS = frozenset(STR_NA_VALUES)  # cells read_excel reads as NaN: "", "NA", "N/A", "null", ...
+
+# Tables are read and written by file extension. Excel files go through calamine when
+# python-calamine is installed (several times faster than openpyxl), and a parsed workbook
+# can be kept as a sidecar named by the file's SHA-256, so dedups of the same file on other
+# columns skip parsing it again. The sidecar is a pandas pickle, which stores the numpy
+# column blocks as they are; Parquet cannot hold the mixed-type object columns Excel
+# sheets often have.
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+TABLE_EXTENSIONS = EXCEL_EXTENSIONS + (".csv", ".parquet")
+TABLE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".omnitoolsuite", "tables")
+TABLE_CACHE_FILES = 16
+
+def excel_engine():
+    return "calamine" if importlib.util.find_spec("python_calamine") else None
+
+def table_extension(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in TABLE_EXTENSIONS:
+        raise ValueError(f"Unsupported file type: {extension or path}")
+    return extension
+
+def parse_table(path, sheet_name=0):
+    extension = table_extension(path)
+    if extension == ".csv":
+        return pd.read_csv(path)
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_excel(path, sheet_name=sheet_name, engine=excel_engine())
+
+def trim_table_cache(directory, keep=TABLE_CACHE_FILES):
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".pkl")]
+    for path in sorted(paths, key=os.path.getmtime)[:-keep]:
+        os.remove(path)
+
+def read_table(path, sheet_name=0, use_cache=False, cache_dir=TABLE_CACHE_DIR):
+    if not use_cache or table_extension(path) not in EXCEL_EXTENSIONS:
+        return parse_table(path, sheet_name)
+    # The parsed frame depends on the engine and the pandas version as well as the file
+    key = hashlib.sha256(repr((file_sha256(path), sheet_name, excel_engine(), pd.__version__)).encode()).hexdigest()
+    sidecar = os.path.join(cache_dir, key + ".pkl")
+    if os.path.exists(sidecar):
+        try:
+            df = pd.read_pickle(sidecar)
+            os.utime(sidecar)
+            return df
+        except Exception:
+            pass
+    df = parse_table(path, sheet_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = sidecar + ".tmp"
+    df.to_pickle(temp_path, compression=None)
+    os.replace(temp_path, sidecar)
+    trim_table_cache(cache_dir)
+    return df
+
+def split_columns(text):
+    # "id, Name" -> ["id", "Name"]
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+def key_columns(column_names):
+    columns = [column_names] if isinstance(column_names, str) else list(column_names)
+    if not columns:
+        raise ValueError("No key column given.")
+    return columns
+
+def drop_duplicate_rows(df, column_names, normalizers=(), index_mb=None, spill_dir=None):
+    # Keeps the first row of every key like drop_duplicates(keep='first'); the key is the
+    # combination of column_names after normalizers, compared by hash. With index_mb the
+    # key index moves to a temporary SQLite file once it outgrows that many megabytes.
+    columns = key_columns(column_names)
+    for column_name in columns:
+        if column_name not in df.columns:
+            raise ValueError(f"Column '{column_name}' not found in the Excel file.")
+    primary, check = key_hashes([df[column_name] for column_name in columns], normalizers)
+    with KeyIndex(index_max_keys(index_mb), spill_dir) as index:
+        return df[index.first_seen(primary, check)]
+
+def write_table(df, path):
+    extension = table_extension(path)
+    if extension == ".csv":
+        df.to_csv(path, index=False)
+    elif extension == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+def header_index(header, column_name):
+    for index, name in enumerate(header):
+        if name is not None and str(name) == column_name:
+            return index
+    raise ValueError(f"Column '{column_name}' not found in the Excel file.")
+
+def stream_remove_duplicates(input_path, output_path, column_names, normalizers=(), progress=None,
+                             index_mb=None, spill_dir=None):
+    # One pass over the first sheet of an .xlsx, as read_excel(sheet_name=0) reads it, with
+    # openpyxl's read-only reader and write-only writer, keeping the first row of every key
+    # like drop_duplicates(keep='first'). Rows are hashed in chunks of STREAM_CHUNK_ROWS and
+    # only the key index grows with the file. Rows are read as read_excel reads them: blank
+    # rows count as rows with an empty key unless they trail the sheet, and key cells
+    # holding one of its NA strings are empty keys. Kept rows are written with their cells
+    # as they are.
+    for path in (input_path, output_path):
+        if table_extension(path) != ".xlsx":
+            raise ValueError("Streaming mode reads and writes .xlsx files only.")
+    from openpyxl import load_workbook, Workbook
+    source = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        rows = source.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("The Excel file is empty.")
+        indexes = [header_index(header, column_name) for column_name in key_columns(column_names)]
+        target = Workbook(write_only=True)
+        sheet = target.create_sheet()
+        sheet.append(header)
+        rows_in = rows_out = 0
+        with KeyIndex(index_max_keys(index_mb), spill_dir) as index:
+            def write_chunk(chunk):
+                columns = []
+                for i in indexes:
+                    values = np.empty(len(chunk), dtype=object)
+                    values[:] = [None if i >= len(row) or (isinstance(row[i], str) and row[i] in NA_STRINGS)
+                                 else row[i] for row in chunk]
+                    columns.append(values)
+                kept = 0
+                for row, first in zip(chunk, index.first_seen(*key_hashes(columns, normalizers))):
+                    if first:
+                        sheet.append(row)
+                        kept += 1
+                return kept
+
+            chunk = []
+            blank_rows = 0  # blank rows seen since the last non-blank one
+            for row in rows:
+                if all(value is None for value in row):
+                    blank_rows += 1
+                    continue
+                chunk.extend([()] * blank_rows)
+                blank_rows = 0
+                chunk.append(row)
+                if len(chunk) >= STREAM_CHUNK_ROWS:
+                    rows_in += len(chunk)
+                    rows_out += write_chunk(chunk)
+                    chunk = []
+                    if progress:
+                        progress(rows_in)
+            if chunk:
+                rows_in += len(chunk)
+                rows_out += write_chunk(chunk)
+            spilled = index.spilled
+        target.save(output_path)
+    finally:
+        source.close()
+    return {"rows_in": rows_in, "rows_out": rows_out, "index_spilled": spilled}
+
+def key_label(value):
+    return "(empty)" if pd.isna(value) else str(value)
+
+def analyze_duplicates(df, normalizers=(), top=5, approximate=False, file_size=None):
+    # What deduping on each column would do, without writing anything: distinct keys, rows
+    # removed, the most repeated keys and the output size, estimated from file_size as if
+    # rows were of equal size. With approximate, number and date columns get a HyperLogLog
+    # estimate and no top keys, which skips their hash tables on very wide sheets; text
+    # columns are still counted exactly, factorize being as fast as hashing them in Python.
+    rows = len(df)
+    columns = []
+    for position, column_name in enumerate(df.columns):
+        column = df.iloc[:, position]
+        estimated = approximate and isinstance(column.dtype, np.dtype) and column.dtype.kind in "biufmM"
+        if estimated:
+            distinct, top_keys = approximate_distinct(column.to_numpy()), []
+        else:
+            distinct, top_keys = column_cardinality(column, normalizers, top)
+        columns.append({
+            "column": str(column_name),
+            "approximate": estimated,
+            "distinct": distinct,
+            "duplicates": rows - distinct,
+            "rows_out": distinct,
+            "estimated_bytes": round(file_size * distinct / rows) if file_size and rows else None,
+            "top_keys": [[key_label(value), count] for value, count in top_keys],
+        })
+    return {"rows": rows, "approximate": approximate, "columns": columns}
+
+def analyze_table(path, normalizers=(), top=5, approximate=False, sheet_name=0, use_cache=False):
+    df = read_table(path, sheet_name, use_cache=use_cache)
+    return analyze_duplicates(df, normalizers, top, approximate, os.path.getsize(path))
+
+def remove_duplicates(input_path, output_path, column_names, streaming=False, use_cache=False,
+                      normalizers=(), index_mb=None):
+    if streaming:
+        return stream_remove_duplicates(input_path, output_path, column_names, normalizers, index_mb=index_mb)
+    df = read_table(input_path, use_cache=use_cache)
+    deduped = drop_duplicate_rows(df, column_names, normalizers, index_mb)
+    write_table(deduped, output_path)
+    return {"rows_in": len(df), "rows_out": len(deduped)}
+
+# Batch mode: one global dedup over every sheet of every table under a directory (or every
+# sheet of one workbook). Workers parse and hash the sheets in parallel; each returns only
+# the key hashes, its rows staying in a pickle in a temporary directory. The parent feeds
+# the hashes to one KeyIndex in source order (files sorted by path, sheets in workbook
+# order), so the first occurrence across all sources is kept, then the surviving rows are
+# written either per source or merged into one file, along with a per-source report.
+REPORT_NAME = "dedup_report.csv"
+
+def find_table_files(input_dir):
+    return find_files(input_dir, TABLE_EXTENSIONS)
+
+def sheet_names(path):
+    if table_extension(path) not in EXCEL_EXTENSIONS:
+        return [None]
+    with pd.ExcelFile(path, engine=excel_engine()) as workbook:
+        return list(workbook.sheet_names)
+
+def hash_source(path, sheet_name, column_names, normalizers, frame_path):
+    # Worker entry point for dedup_batch; returns the key hashes of the sheet's rows and
+    # the stage timings. Row i of the sheet is row i of the frame pickled at frame_path.
+    metrics = StageMetrics()
+    with stage(metrics, "parse"):
+        df = parse_table(path, 0 if sheet_name is None else sheet_name)
+    for column_name in column_names:
+        if column_name not in df.columns:
+            raise ValueError(f"Column '{column_name}' not found")
+    with stage(metrics, "hash"):
+        primary, check = key_hashes([df[column_name] for column_name in column_names], normalizers)
+    with stage(metrics, "spill"):
+        df.to_pickle(frame_path, compression=None)
+    return primary, check, metrics.as_dict()
+
+def kept_rows(frame_path, mask):
+    return pd.read_pickle(frame_path)[mask]
+
+def write_source(output_path, parts):
+    # Worker entry point for dedup_batch; parts is [(sheet_name, frame_path, mask)] of one file
+    if table_extension(output_path) not in EXCEL_EXTENSIONS:
+        _, frame_path, mask = parts[0]
+        write_table(kept_rows(frame_path, mask), output_path)
+        return
+    with pd.ExcelWriter(output_path) as writer:
+        for sheet_name, frame_path, mask in parts:
+            kept_rows(frame_path, mask).to_excel(writer, sheet_name=sheet_name, index=False)
+
+def write_report(report, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["source", "rows_in", "rows_out", "dropped"])
+        writer.writeheader()
+        writer.writerows(report)
+
+def dedup_batch(input_path, output_path, column_names, normalizers=(), merge=False, all_sheets=True,
+                workers=None, index_mb=None, log=None, progress=None, should_stop=None):
+    # input_path is a directory of tables or one workbook. With merge, output_path is the
+    # merged file; otherwise it is a directory that gets each source file under its relative
+    # path (.xls as .xlsx). The report goes next to the output. log, progress and
+    # should_stop work like in audio_denoiser.denoise_batch.
+    log = log or (lambda message: None)
+    progress = progress or (lambda done, total: None)
+    should_stop = should_stop or (lambda: False)
+    workers = workers or default_worker_count()
+    column_names = key_columns(column_names)
+    result = {"sources": 0, "rows_in": 0, "rows_out": 0, "cancelled": 0, "errors": {}, "report": [],
+              "outputs": [], "stages": {}}
+    if os.path.isdir(input_path):
+        base_dir, file_list = input_path, find_table_files(input_path)
+    else:
+        base_dir, file_list = os.path.dirname(input_path), [input_path]
+    sources = []  # (label, rel_path, path, sheet_name)
+    for path in file_list:
+        rel_path = os.path.relpath(path, base_dir)
+        try:
+            sheets = sheet_names(path)
+        except Exception as e:
+            result["errors"][rel_path] = str(e)
+            log(f"Error reading {rel_path}: {e}")
+            continue
+        for sheet_name in (sheets if all_sheets else sheets[:1]):
+            label = rel_path if sheet_name is None else f"{rel_path} [{sheet_name}]"
+            sources.append((label, rel_path, path, sheet_name))
+    result["sources"] = len(sources)
+    if not sources:
+        return result
+    progress(0, len(sources))
+    log(f"Hashing {len(sources)} sheets with {workers} workers")
+    records = {}
+    temp_dir = tempfile.TemporaryDirectory(prefix="dedup_batch_")
+    frame_path = lambda number: os.path.join(temp_dir.name, f"{number}.pkl")
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        with KeyIndex(index_max_keys(index_mb)) as index:
+            # Hashes wait here until every earlier source is in the index
+            hashed = {}
+            masks = {}
+            next_source = 0
+
+            def on_hashed(number, value, error):
+                nonlocal next_source
+                label = sources[number][0]
+                if error is None:
+                    primary, check, records[label] = value
+                    hashed[number] = (primary, check)
+                else:
+                    hashed[number] = None
+                    result["errors"][label] = str(error)
+                    log(f"Error hashing {label}: {error}")
+                while next_source in hashed:
+                    keys = hashed.pop(next_source)
+                    if keys is not None:
+                        masks[next_source] = mask = index.first_seen(*keys)
+                        rows_in, rows_out = len(mask), int(mask.sum())
+                        result["report"].append({"source": sources[next_source][0], "rows_in": rows_in,
+                                                 "rows_out": rows_out, "dropped": rows_in - rows_out})
+                        result["rows_in"] += rows_in
+                        result["rows_out"] += rows_out
+                    next_source += 1
+
+            tasks = [(number, hash_source, path, sheet_name, column_names, normalizers, frame_path(number))
+                     for number, (_, _, path, sheet_name) in enumerate(sources)]
+            result["cancelled"] = run_pool(tasks, on_hashed, log=log, progress=progress, should_stop=should_stop,
+                                           executor=executor, noun="sheets")
+            if should_stop():
+                return result
+            if index.spilled:
+                log("Key index spilled to disk")
+
+        if not masks:
+            return result
+        done = len(sources)
+        if merge:
+            progress(done, done + 1)
+            log(f"Writing {result['rows_out']} rows to {output_path}")
+            merged = pd.concat([kept_rows(frame_path(number), mask) for number, mask in masks.items()],
+                               ignore_index=True)
+            write_table(merged, output_path)
+            result["outputs"].append(output_path)
+            report_path = os.path.splitext(output_path)[0] + "_report.csv"
+            progress(done + 1, done + 1)
+        else:
+            outputs = {}
+            for number, mask in masks.items():
+                _, rel_path, _, sheet_name = sources[number]
+                outputs.setdefault(rel_path, []).append((sheet_name, frame_path(number), mask))
+            log(f"Writing {len(outputs)} files")
+            tasks = []
+            for rel_path, parts in outputs.items():
+                target = os.path.join(output_path, rel_path)
+                if target.lower().endswith(".xls"):
+                    target += "x"
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tasks.append(((rel_path, target), write_source, target, parts))
+
+            def on_written(key, value, error):
+                rel_path, target = key
+                if error is None:
+                    result["outputs"].append(target)
+                    log(f"Wrote {target}")
+                else:
+                    result["errors"][rel_path] = str(error)
+                    log(f"Error writing {rel_path}: {error}")
+
+            result["cancelled"] = run_pool(tasks, on_written, log=log, should_stop=should_stop, executor=executor,
+                                           progress=lambda written, total: progress(done + written, done + total))
+            os.makedirs(output_path, exist_ok=True)
+            report_path = os.path.join(output_path, REPORT_NAME)
+        write_report(result["report"], report_path)
+        result["report_path"] = report_path
+    finally:
+        # Running workers still write into temp_dir
+        executor.shutdown(wait=True, cancel_futures=True)
+        temp_dir.cleanup()
+    for row in result["report"]:
+        log(f"{row['source']}: {row['dropped']} of {row['rows_in']} rows dropped")
+    if records:
+        result["stages"] = summarize(records)
+        log("Stage summary:")
+        for line in format_summary(result["stages"]):
+            log("  " + line)
+    return result
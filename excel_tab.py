@@ -1,70 +1,291 @@
+import os
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
+from excel_duplicate_remover import (read_table, drop_duplicate_rows, write_table, stream_remove_duplicates,
+                                     split_columns, dedup_batch, analyze_table)
+from dedup_keys import DEFAULT_INDEX_MB
 
 class ExcelDuplicateRemoverTab:
     def __init__(self, parent):
         self.frame = ttk.Frame(parent, padding=10)
+        self.root = parent.winfo_toplevel()
         self.selected_file = None
         self.build_widgets()
 
     def build_widgets(self):
-        self.browse_button = ttk.Button(self.frame, text="Browse Excel File", command=self.browse_file, width=25)
-        self.browse_button.pack(pady=10)
+        self.browse_frame = ttk.Frame(self.frame)
+        self.browse_frame.pack(pady=10)
+        self.browse_button = ttk.Button(self.browse_frame, text="Browse Excel File", command=self.browse_file, width=25)
+        self.browse_button.pack(side=tk.LEFT, padx=5)
+        self.browse_folder_button = ttk.Button(self.browse_frame, text="Browse Folder", command=self.browse_folder,
+                                               width=25)
+        self.browse_folder_button.pack(side=tk.LEFT, padx=5)
 
         self.file_label = ttk.Label(self.frame, text="No file selected", wraplength=450)
         self.file_label.pack(pady=5)
 
         self.column_frame = ttk.Frame(self.frame)
         self.column_frame.pack(pady=10)
-        self.column_label = ttk.Label(self.column_frame, text="Special Column Name:")
+        self.column_label = ttk.Label(self.column_frame, text="Key Columns (comma-separated):")
         self.column_label.pack(side=tk.LEFT, padx=5)
         self.column_entry = ttk.Entry(self.column_frame, width=30)
         self.column_entry.pack(side=tk.LEFT)
 
-        self.process_button = ttk.Button(self.frame, text="Process File", command=self.process_file, width=25)
-        self.process_button.pack(pady=20)
+        # Text keys are compared after these normalizers
+        self.normalize_frame = ttk.Frame(self.frame)
+        self.normalize_frame.pack(pady=5)
+        self.normalize_vars = {}
+        for name, text in (("strip", "Trim Whitespace"), ("spaces", "Collapse Spaces"),
+                           ("casefold", "Ignore Case"), ("nfkc", "Unicode NFKC")):
+            self.normalize_vars[name] = tk.BooleanVar(value=False)
+            ttk.Checkbutton(self.normalize_frame, text=text,
+                            variable=self.normalize_vars[name]).pack(side=tk.LEFT, padx=5)
+
+        self.spill_frame = ttk.Frame(self.frame)
+        self.spill_frame.pack(pady=5)
+        self.spill_var = tk.BooleanVar(value=False)
+        self.spill_check = ttk.Checkbutton(self.spill_frame, text="Spill Key Index to Disk Above (MB):",
+                                           variable=self.spill_var)
+        self.spill_check.pack(side=tk.LEFT, padx=5)
+        self.spill_entry = ttk.Entry(self.spill_frame, width=8)
+        self.spill_entry.insert(0, str(DEFAULT_INDEX_MB))
+        self.spill_entry.pack(side=tk.LEFT)
+
+        # Streaming reads and writes the workbook row by row, for files too large for pandas
+        self.streaming_var = tk.BooleanVar(value=False)
+        self.streaming_check = ttk.Checkbutton(self.frame, text="Streaming Mode (large .xlsx files)",
+                                               variable=self.streaming_var)
+        self.streaming_check.pack(pady=5)
+
+        # The parsed workbook is kept on disk, so trying other columns skips parsing it again
+        self.cache_var = tk.BooleanVar(value=True)
+        self.cache_check = ttk.Checkbutton(self.frame, text="Cache Parsed Workbook", variable=self.cache_var)
+        self.cache_check.pack(pady=5)
+
+        # A folder, or a workbook with All Sheets, is deduped as one table across all sheets
+        self.batch_frame = ttk.Frame(self.frame)
+        self.batch_frame.pack(pady=5)
+        self.all_sheets_var = tk.BooleanVar(value=False)
+        self.all_sheets_check = ttk.Checkbutton(self.batch_frame, text="All Sheets", variable=self.all_sheets_var)
+        self.all_sheets_check.pack(side=tk.LEFT, padx=5)
+        self.merge_var = tk.BooleanVar(value=False)
+        self.merge_check = ttk.Checkbutton(self.batch_frame, text="Merge Into One File", variable=self.merge_var)
+        self.merge_check.pack(side=tk.LEFT, padx=5)
+
+        # Analysis reports what every column would remove as the key, without writing a file
+        self.approximate_var = tk.BooleanVar(value=False)
+        self.approximate_check = ttk.Checkbutton(self.frame, text="Approximate Analysis (wide sheets)",
+                                                 variable=self.approximate_var)
+        self.approximate_check.pack(pady=5)
+
+        self.button_frame = ttk.Frame(self.frame)
+        self.button_frame.pack(pady=20)
+        self.process_button = ttk.Button(self.button_frame, text="Process File", command=self.process_file, width=25)
+        self.process_button.pack(side=tk.LEFT, padx=5)
+        self.analyze_button = ttk.Button(self.button_frame, text="Analyze Columns", command=self.analyze_file,
+                                         width=25)
+        self.analyze_button.pack(side=tk.LEFT, padx=5)
+
+        self.status_label = ttk.Label(self.frame, text="")
+        self.status_label.pack(pady=5)
 
     def browse_file(self):
         filepath = filedialog.askopenfilename(
             title="Select Excel File",
-            filetypes=[("Excel files", "*.xlsx *.xls")]
+            filetypes=[("Excel files", "*.xlsx *.xlsm *.xls"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")]
         )
         if filepath:
             self.file_label.config(text=filepath)
             self.selected_file = filepath
 
+    def browse_folder(self):
+        folder = filedialog.askdirectory(title="Select Folder of Workbooks")
+        if folder:
+            self.file_label.config(text=folder)
+            self.selected_file = folder
+
+    def key_options(self):
+        normalizers = tuple(name for name, var in self.normalize_vars.items() if var.get())
+        index_mb = float(self.spill_entry.get()) if self.spill_var.get() else None
+        return normalizers, index_mb
+
     def process_file(self):
-        column_name = self.column_entry.get().strip()
+        column_names = split_columns(self.column_entry.get())
         if not self.selected_file:
             messagebox.showerror("Error", "Please select an Excel file!")
             return
-        if not column_name:
+        if not column_names:
             messagebox.showerror("Error", "Please enter the column name to process!")
             return
+        try:
+            normalizers, index_mb = self.key_options()
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a number for the key index size!")
+            return
+        if os.path.isdir(self.selected_file) or self.all_sheets_var.get():
+            self.process_batch(column_names, normalizers, index_mb)
+            return
+        if self.streaming_var.get():
+            self.process_streaming(column_names, normalizers, index_mb)
+            return
 
         try:
-            df = pd.read_excel(self.selected_file)
+            df = read_table(self.selected_file, use_cache=self.cache_var.get())
         except Exception as e:
             messagebox.showerror("Error", f"Failed to read the Excel file:\n{e}")
             return
 
-        if column_name not in df.columns:
-            messagebox.showerror("Error", f"Column '{column_name}' not found in the Excel file.")
+        try:
+            df = drop_duplicate_rows(df, column_names, normalizers, index_mb)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
-        df = df.drop_duplicates(subset=[column_name], keep='first')
-
         save_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx *.xls")],
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")],
             title="Save Edited File As"
         )
         if not save_path:
             return
 
         try:
-            df.to_excel(save_path, index=False)
+            write_table(df, save_path)
             messagebox.showinfo("Success", f"File saved successfully:\n{save_path}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save the file:\n{e}")
+
+    def process_streaming(self, column_names, normalizers, index_mb):
+        if not self.selected_file.lower().endswith(".xlsx"):
+            messagebox.showerror("Error", "Streaming mode reads .xlsx files only.")
+            return
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx")],
+            title="Save Edited File As"
+        )
+        if not save_path:
+            return
+        self.process_button.config(state="disabled")
+        self.set_status("Processing...")
+        threading.Thread(target=self.stream_thread, args=(column_names, normalizers, index_mb, save_path), daemon=True).start()
+
+    def stream_thread(self, column_names, normalizers, index_mb, save_path):
+        try:
+            result = stream_remove_duplicates(self.selected_file, save_path, column_names, normalizers,
+                                              progress=lambda rows: self.set_status(f"Processed {rows:,} rows..."),
+                                              index_mb=index_mb)
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to process the file:\n{e}"))
+            self.set_status("")
+        else:
+            removed = result["rows_in"] - result["rows_out"]
+            self.set_status(f"{result['rows_in']:,} rows read, {removed:,} duplicates removed")
+            self.root.after(0, lambda: messagebox.showinfo("Success", f"File saved successfully:\n{save_path}"))
+        self.root.after(0, lambda: self.process_button.config(state="normal"))
+
+    def process_batch(self, column_names, normalizers, index_mb):
+        if self.merge_var.get():
+            save_path = filedialog.asksaveasfilename(
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")],
+                title="Save Merged File As"
+            )
+        else:
+            save_path = filedialog.askdirectory(title="Select Output Folder")
+        if not save_path:
+            return
+        self.process_button.config(state="disabled")
+        self.set_status("Processing...")
+        threading.Thread(target=self.batch_thread, args=(column_names, normalizers, index_mb, save_path),
+                         daemon=True).start()
+
+    def batch_thread(self, column_names, normalizers, index_mb, save_path):
+        try:
+            result = dedup_batch(self.selected_file, save_path, column_names, normalizers,
+                                 merge=self.merge_var.get(), all_sheets=self.all_sheets_var.get(),
+                                 index_mb=index_mb,
+                                 progress=lambda done, total: self.set_status(f"Processed {done} of {total}..."))
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to process the files:\n{e}"))
+            self.set_status("")
+        else:
+            removed = result["rows_in"] - result["rows_out"]
+            self.set_status(f"{result['sources']} sheets, {result['rows_in']:,} rows read, "
+                            f"{removed:,} duplicates removed")
+            message = f"Saved to:\n{save_path}"
+            if result.get("report_path"):
+                message += f"\n\nPer-sheet report:\n{result['report_path']}"
+            if result["errors"]:
+                message += "\n\nSkipped:\n" + "\n".join(f"{source}: {error}" for source, error
+                                                         in list(result["errors"].items())[:10])
+            self.root.after(0, lambda: messagebox.showinfo("Done", message))
+        self.root.after(0, lambda: self.process_button.config(state="normal"))
+
+    def analyze_file(self):
+        if not self.selected_file or os.path.isdir(self.selected_file):
+            messagebox.showerror("Error", "Please select an Excel file!")
+            return
+        normalizers = tuple(name for name, var in self.normalize_vars.items() if var.get())
+        self.analyze_button.config(state="disabled")
+        self.set_status("Analyzing...")
+        threading.Thread(target=self.analyze_thread, args=(normalizers,), daemon=True).start()
+
+    def analyze_thread(self, normalizers):
+        try:
+            analysis = analyze_table(self.selected_file, normalizers, approximate=self.approximate_var.get(),
+                                     use_cache=self.cache_var.get())
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to analyze the file:\n{e}"))
+            self.set_status("")
+        else:
+            self.set_status(f"{analysis['rows']:,} rows, {len(analysis['columns'])} columns analyzed")
+            self.root.after(0, lambda: self.show_analysis(analysis))
+        self.root.after(0, lambda: self.analyze_button.config(state="normal"))
+
+    def show_analysis(self, analysis):
+        window = tk.Toplevel(self.root)
+        window.title("Duplicate Analysis")
+        fields = ("column", "distinct", "duplicates", "size", "top")
+        headings = ("Column", "Distinct Keys", "Duplicates Removed", "Est. Output Size", "Most Repeated Keys")
+        tree = ttk.Treeview(window, columns=fields, show="headings", height=15)
+        # Headings sort by the numbers behind the formatted cells; a second click reverses
+        sort_keys = {
+            "column": lambda column: column["column"].casefold(),
+            "distinct": lambda column: column["distinct"],
+            "duplicates": lambda column: column["duplicates"],
+            "size": lambda column: column["estimated_bytes"] or 0,
+            "top": lambda column: column["top_keys"][0][1] if column["top_keys"] else 0,
+        }
+        rows = {}
+        sort_state = {"field": None, "descending": False}
+
+        def sort_by(field):
+            descending = sort_state["field"] == field and not sort_state["descending"]
+            sort_state.update(field=field, descending=descending)
+            ordered = sorted(rows, key=lambda item: sort_keys[field](rows[item]), reverse=descending)
+            for position, item in enumerate(ordered):
+                tree.move(item, "", position)
+
+        for field, heading in zip(fields, headings):
+            tree.heading(field, text=heading, command=lambda field=field: sort_by(field))
+            tree.column(field, width=300 if field == "top" else 120, anchor="w" if field in ("column", "top") else "e")
+        for column in analysis["columns"]:
+            prefix = "~" if column["approximate"] else ""
+            size = column["estimated_bytes"]
+            item = tree.insert("", tk.END, values=(
+                column["column"],
+                f"{prefix}{column['distinct']:,}",
+                f"{prefix}{column['duplicates']:,}",
+                f"{size / 1024:,.0f} KB" if size is not None else "",
+                ", ".join(f"{key} ({count})" for key, count in column["top_keys"]),
+            ))
+            rows[item] = column
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=10)
+
+    def set_status(self, text):
+        self.root.after(0, lambda: self.status_label.config(text=text))
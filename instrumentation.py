@@ -0,0 +1,83 @@
+import os
+import csv
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Per-stage timing and peak-allocation records for the processing pipelines. A pipeline
+# wraps each stage in stage(metrics, "name"); with metrics=None that costs nothing.
+
+class StageMetrics:
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Stages running on several threads add up their seconds
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                record = self.stages.setdefault(name, {"seconds": 0.0, "peak_bytes": None})
+                record["seconds"] += elapsed
+                if self.track_memory:
+                    peak = tracemalloc.get_traced_memory()[1] - baseline
+                    record["peak_bytes"] = max(record["peak_bytes"] or 0, peak)
+
+    def as_dict(self):
+        return {name: dict(record) for name, record in self.stages.items()}
+
+def stage(metrics, name):
+    if metrics is None:
+        return nullcontext()
+    return metrics.stage(name)
+
+def summarize(records):
+    # records maps an item (usually a file) to its as_dict() stages; returns per-stage totals
+    summary = {}
+    for stages in records.values():
+        for name, record in stages.items():
+            total = summary.setdefault(name, {"items": 0, "total_s": 0.0, "max_s": 0.0, "max_peak_bytes": None})
+            total["items"] += 1
+            total["total_s"] += record["seconds"]
+            total["max_s"] = max(total["max_s"], record["seconds"])
+            if record["peak_bytes"] is not None:
+                total["max_peak_bytes"] = max(total["max_peak_bytes"] or 0, record["peak_bytes"])
+    for total in summary.values():
+        total["mean_s"] = total["total_s"] / total["items"]
+    return summary
+
+def format_summary(summary):
+    grand_total = sum(total["total_s"] for total in summary.values()) or 1.0
+    lines = []
+    for name, total in summary.items():
+        line = (f"{name:<10} total {total['total_s']:8.2f} s ({100 * total['total_s'] / grand_total:4.1f}%)"
+                f"  mean {total['mean_s']:.3f} s  max {total['max_s']:.3f} s")
+        if total["max_peak_bytes"] is not None:
+            line += f"  peak {total['max_peak_bytes'] / (1024 * 1024):.1f} MB"
+        lines.append(line)
+    return lines
+
+def write_metrics(path, records):
+    # .csv gets one row per item and stage, anything else a JSON document with a summary
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["item", "stage", "seconds", "peak_bytes"])
+            for item, stages in records.items():
+                for name, record in stages.items():
+                    writer.writerow([item, name, f"{record['seconds']:.6f}", record["peak_bytes"]])
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"items": records, "summary": summarize(records)}, f, indent=2)
@@ -1,36 +1,67 @@
+import importlib
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk
-from excel_tab import ExcelDuplicateRemoverTab
-from tts_tab import TextToSpeechConverterTab
-from audio_denoiser_tab import AudioDenoiserTab
-from powerpoint_text_extractor_tab import PowerPointTextExtractorTab
-from audio_splitter_tab import AudioSplitterTab
+
+# (attribute, module, class, title) in notebook order. A tab's module, and with it
+# librosa, pandas, pydub, gTTS, python-pptx and friends, is imported only when the tab
+# is first selected.
+TABS = [
+    ("excel_tab", "excel_tab", "ExcelDuplicateRemoverTab", "Excel Duplicate Remover"),
+    ("tts_tab", "tts_tab", "TextToSpeechConverterTab", "Text-to-Speech Converter"),
+    ("audio_denoiser_tab", "audio_denoiser_tab", "AudioDenoiserTab", "Audio Denoiser"),
+    ("pptx_extractor_tab", "powerpoint_text_extractor_tab", "PowerPointTextExtractorTab", "PPTX Text Extractor"),
+    ("audio_splitter_tab", "audio_splitter_tab", "AudioSplitterTab", "Audio Splitter"),
+    ("pipeline_tab", "pipeline_tab", "AudioPipelineTab", "Audio Pipeline"),
+]
 
 class OmniToolSuite:
-    def __init__(self, root):
+    def __init__(self, root, lazy=True):
         self.root = root
         self.root.title("OmniTool Suite")
         self.root.geometry("900x700")
+        self.lazy = lazy
         self.build_gui()
 
     def build_gui(self):
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(expand=1, fill="both")
 
-        self.excel_tab = ExcelDuplicateRemoverTab(self.notebook)
-        self.notebook.add(self.excel_tab.frame, text="Excel Duplicate Remover")
-
-        self.tts_tab = TextToSpeechConverterTab(self.notebook)
-        self.notebook.add(self.tts_tab.frame, text="Text-to-Speech Converter")
+        self.placeholders = {}
+        for attr, module_name, class_name, title in TABS:
+            setattr(self, attr, None)
+            placeholder = ttk.Frame(self.notebook)
+            ttk.Label(placeholder, text=f"Loading {title}...").pack(expand=1)
+            self.notebook.add(placeholder, text=title)
+            self.placeholders[str(placeholder)] = (placeholder, attr, module_name, class_name)
 
-        self.audio_denoiser_tab = AudioDenoiserTab(self.notebook)
-        self.notebook.add(self.audio_denoiser_tab.frame, text="Audio Denoiser")
+        if self.lazy:
+            self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.load_selected_tab())
+            # Let the window draw before the first tab pulls in its dependencies
+            self.root.after_idle(self.load_selected_tab)
+        else:
+            for key in list(self.placeholders):
+                self.load_tab(key)
 
-        self.pptx_extractor_tab = PowerPointTextExtractorTab(self.notebook)
-        self.notebook.add(self.pptx_extractor_tab.frame, text="PPTX Text Extractor")
+    def load_selected_tab(self):
+        key = self.notebook.select()
+        if key in self.placeholders:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                self.load_tab(key)
+            finally:
+                self.root.config(cursor="")
 
-        self.audio_splitter_tab = AudioSplitterTab(self.notebook)
-        self.notebook.add(self.audio_splitter_tab.frame, text="Audio Splitter")
+    def load_tab(self, key):
+        placeholder, attr, module_name, class_name = self.placeholders.pop(key)
+        module = importlib.import_module(module_name)
+        tab = getattr(module, class_name)(placeholder)
+        for child in placeholder.winfo_children():
+            if child is not tab.frame:
+                child.destroy()
+        tab.frame.pack(expand=1, fill="both")
+        setattr(self, attr, tab)
 
 def main():
     root = tk.Tk()  # Create the main application window
@@ -38,4 +69,6 @@ def main():
     root.mainloop()  # Run the event loop
 
 if __name__ == "__main__":
+    # Required for the denoiser's process pool in the frozen PyInstaller build
+    multiprocessing.freeze_support()
     main()
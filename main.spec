@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Tab modules are imported lazily by name in main.py
+    hiddenimports=['excel_tab', 'tts_tab', 'audio_denoiser_tab', 'powerpoint_text_extractor_tab', 'audio_splitter_tab', 'pipeline_tab'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
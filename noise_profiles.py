@@ -0,0 +1,32 @@
+import os
+import numpy as np
+
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".omnitoolsuite", "noise_profiles")
+PER_FILE_NOISE = "(per file)"  # menu entry for sampling the noise from each file
+
+def profile_path(name, directory=PROFILE_DIR):
+    if not name or os.path.basename(name) != name:
+        raise ValueError(f"Invalid noise profile name: {name!r}")
+    return os.path.join(directory, name + ".npz")
+
+def save_noise_profile(name, profile, directory=PROFILE_DIR):
+    path = profile_path(name, directory)
+    os.makedirs(directory, exist_ok=True)
+    np.savez(path, **profile)
+    return path
+
+def load_noise_profile(name, directory=PROFILE_DIR):
+    with np.load(profile_path(name, directory)) as data:
+        return {
+            "sr": int(data["sr"]),
+            "n_fft": int(data["n_fft"]),
+            "win_length": int(data["win_length"]),
+            "hop_length": int(data["hop_length"]),
+            "mean_db": data["mean_db"],
+            "std_db": data["std_db"],
+        }
+
+def list_noise_profiles(directory=PROFILE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(directory) if f.endswith(".npz"))
@@ -0,0 +1,212 @@
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from audio_pipeline import pipeline_batch, ENCODE_FORMATS
+from batch_pool import default_worker_count
+from noise_profiles import list_noise_profiles, load_noise_profile, PER_FILE_NOISE
+
+class AudioPipelineTab:
+    def __init__(self, parent):
+        self.parent = parent
+        self.root = parent.winfo_toplevel()
+        self.frame = ttk.Frame(parent, padding=10)
+        self.processing = False
+        self.stop_event = None
+        self.create_widgets()
+
+    def create_widgets(self):
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+        self.main_frame = ttk.Frame(self.frame, padding=20)
+        self.main_frame.grid(row=0, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
+        self.main_frame.columnconfigure(0, weight=1)
+
+        input_frame = ttk.Frame(self.main_frame)
+        input_frame.grid(row=0, column=0, sticky=tk.EW, pady=5)
+        ttk.Label(input_frame, text="Input Directory:").grid(row=0, column=0, padx=5)
+        self.input_dir = ttk.Entry(input_frame, width=60)
+        self.input_dir.grid(row=0, column=1, padx=5, sticky=tk.EW)
+        ttk.Button(input_frame, text="Browse", command=lambda: self.select_dir(self.input_dir)).grid(row=0, column=2, padx=5)
+        input_frame.columnconfigure(1, weight=1)
+
+        output_frame = ttk.Frame(self.main_frame)
+        output_frame.grid(row=1, column=0, sticky=tk.EW, pady=5)
+        ttk.Label(output_frame, text="Output Directory:").grid(row=0, column=0, padx=5)
+        self.output_dir = ttk.Entry(output_frame, width=60)
+        self.output_dir.grid(row=0, column=1, padx=5, sticky=tk.EW)
+        ttk.Button(output_frame, text="Browse", command=lambda: self.select_dir(self.output_dir)).grid(row=0, column=2, padx=5)
+        output_frame.columnconfigure(1, weight=1)
+
+        denoise_frame = ttk.Labelframe(self.main_frame, text="1. Denoise", padding=10)
+        denoise_frame.grid(row=2, column=0, sticky=tk.EW, pady=5)
+        self.denoise_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(denoise_frame, text="Enabled", variable=self.denoise_var).grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.noise_start = self.add_entry(denoise_frame, "Noise Start (ms):", "0", 0, 1)
+        self.noise_end = self.add_entry(denoise_frame, "Noise End (ms):", "1000", 0, 3)
+        self.volume_boost = self.add_entry(denoise_frame, "Volume Boost (dB):", "3", 1, 1)
+        self.prop_decrease = self.add_entry(denoise_frame, "Strength (0.0 - 1.0):", "1.0", 1, 3)
+        self.low_cut = self.add_entry(denoise_frame, "Low Cut (Hz):", "80", 2, 1)
+        self.high_cut = self.add_entry(denoise_frame, "High Cut (Hz):", "16000", 2, 3)
+        self.n_fft = self.add_entry(denoise_frame, "FFT Size (n_fft):", "2048", 3, 1)
+        self.win_length = self.add_entry(denoise_frame, "Window Length:", "2048", 3, 3)
+        self.hop_length = self.add_entry(denoise_frame, "Hop Length:", "512", 4, 1)
+        self.filter_order = self.add_entry(denoise_frame, "Filter Order:", "6", 4, 3)
+        ttk.Label(denoise_frame, text="Noise Profile:").grid(row=5, column=1, sticky=tk.W, padx=5, pady=2)
+        self.noise_profile_var = tk.StringVar(value=PER_FILE_NOISE)
+        ttk.Combobox(denoise_frame, textvariable=self.noise_profile_var, values=[PER_FILE_NOISE] + list_noise_profiles(),
+                     state="readonly", width=18).grid(row=5, column=2, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        self.float32_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(denoise_frame, text="Float32 Processing", variable=self.float32_var).grid(row=5, column=4, columnspan=2, sticky=tk.W, padx=5, pady=2)
+
+        split_frame = ttk.Labelframe(self.main_frame, text="2. Split on Silence", padding=10)
+        split_frame.grid(row=3, column=0, sticky=tk.EW, pady=5)
+        self.split_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(split_frame, text="Enabled", variable=self.split_var).grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.min_silence_len = self.add_entry(split_frame, "Min Silence (ms):", "550", 0, 1)
+        self.silence_thresh = self.add_entry(split_frame, "Threshold (dB):", "-50", 0, 3)
+        self.extend_begin = self.add_entry(split_frame, "Extend Begin (ms):", "200", 1, 1)
+        self.extend_end = self.add_entry(split_frame, "Extend End (ms):", "400", 1, 3)
+        self.split_volume = self.add_entry(split_frame, "Volume Adjustment (dB):", "0", 2, 1)
+
+        encode_frame = ttk.Labelframe(self.main_frame, text="3. Encode", padding=10)
+        encode_frame.grid(row=4, column=0, sticky=tk.EW, pady=5)
+        ttk.Label(encode_frame, text="Format:").grid(row=0, column=0, sticky=tk.W, padx=5)
+        self.format_var = tk.StringVar(value="wav")
+        ttk.Combobox(encode_frame, textvariable=self.format_var, values=list(ENCODE_FORMATS), state="readonly", width=8).grid(row=0, column=1, sticky=tk.W, padx=5)
+        ttk.Label(encode_frame, text="Bit Depth:").grid(row=0, column=2, sticky=tk.W, padx=5)
+        self.bit_depth_var = tk.StringVar(value="16")
+        ttk.Combobox(encode_frame, textvariable=self.bit_depth_var, values=["16", "32"], state="readonly", width=8).grid(row=0, column=3, sticky=tk.W, padx=5)
+        ttk.Label(encode_frame, text="Parallel Workers:").grid(row=0, column=4, sticky=tk.W, padx=5)
+        self.workers = ttk.Spinbox(encode_frame, from_=1, to=os.cpu_count() or 1, width=6)
+        self.workers.grid(row=0, column=5, sticky=tk.W, padx=5)
+        self.workers.set(default_worker_count())
+
+        self.progress = ttk.Progressbar(self.main_frame, orient=tk.HORIZONTAL, mode='determinate')
+        self.progress.grid(row=5, column=0, sticky=tk.EW, pady=10)
+
+        log_frame = ttk.Frame(self.main_frame)
+        log_frame.grid(row=6, column=0, sticky=tk.N+tk.S+tk.E+tk.W, pady=5)
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(1, weight=1)
+        ttk.Label(log_frame, text="Processing Log:").grid(row=0, column=0, sticky=tk.W)
+        self.log = tk.Text(log_frame, height=8, width=80)
+        self.log.grid(row=1, column=0, sticky=tk.N+tk.S+tk.E+tk.W)
+        log_scroll = ttk.Scrollbar(log_frame, command=self.log.yview)
+        log_scroll.grid(row=1, column=1, sticky=tk.N+tk.S)
+        self.log.configure(yscrollcommand=log_scroll.set)
+
+        btn_frame = ttk.Frame(self.main_frame)
+        btn_frame.grid(row=7, column=0, pady=10)
+        self.start_btn = ttk.Button(btn_frame, text="Start Processing", command=self.start_processing, width=15)
+        self.start_btn.pack(side=tk.LEFT, padx=5)
+        self.main_frame.rowconfigure(6, weight=1)
+
+    def add_entry(self, parent, label, default, row, column):
+        ttk.Label(parent, text=label).grid(row=row, column=column, sticky=tk.W, padx=5, pady=2)
+        entry = ttk.Entry(parent, width=8)
+        entry.grid(row=row, column=column + 1, sticky=tk.W, padx=5, pady=2)
+        entry.insert(0, default)
+        return entry
+
+    def select_dir(self, entry):
+        directory = filedialog.askdirectory()
+        if directory:
+            entry.delete(0, tk.END)
+            entry.insert(0, directory)
+
+    def log_message(self, message):
+        self.root.after(0, lambda: (self.log.insert(tk.END, message + "\n"),
+                                      self.log.see(tk.END)))
+
+    def get_config(self):
+        # Read every Tk widget once so the values can be shipped to worker processes
+        config = {"denoise": None, "split": None, "format": self.format_var.get(),
+                  "bit_depth": int(self.bit_depth_var.get())}
+        if self.denoise_var.get():
+            config["denoise"] = {
+                "noise_start": float(self.noise_start.get()),
+                "noise_end": float(self.noise_end.get()),
+                "volume_boost": float(self.volume_boost.get()),
+                "prop_decrease": float(self.prop_decrease.get()),
+                "lowcut": float(self.low_cut.get()),
+                "highcut": float(self.high_cut.get()),
+                "n_fft": int(self.n_fft.get()),
+                "win_length": int(self.win_length.get()),
+                "hop_length": int(self.hop_length.get()),
+                "filter_order": int(self.filter_order.get()),
+                "float32": self.float32_var.get(),
+                "noise_profile": self.get_noise_profile(),
+            }
+        if self.split_var.get():
+            config["split"] = {
+                "min_silence_len": int(self.min_silence_len.get()),
+                "silence_thresh": int(self.silence_thresh.get()),
+                "extend_duration_begin": int(self.extend_begin.get()),
+                "extend_duration_end": int(self.extend_end.get()),
+                "volume_adjustment": float(self.split_volume.get()),
+            }
+        return config
+
+    def get_noise_profile(self):
+        name = self.noise_profile_var.get()
+        if name == PER_FILE_NOISE:
+            return None
+        return load_noise_profile(name)
+
+    def batch_process(self, stop_event):
+        # Start is given back however the run ends
+        try:
+            input_dir = self.input_dir.get()
+            output_dir = self.output_dir.get()
+            if not input_dir or not output_dir:
+                messagebox.showerror("Error", "Please select both input and output directories")
+                return
+            try:
+                config = self.get_config()
+                workers = int(self.workers.get())
+                if workers < 1:
+                    raise ValueError
+            except Exception:
+                messagebox.showerror("Error", "Invalid parameters")
+                return
+            try:
+                result = pipeline_batch(
+                    input_dir, output_dir, config,
+                    workers=workers,
+                    log=self.log_message,
+                    progress=self.update_progress,
+                    should_stop=stop_event.is_set
+                )
+            except Exception as e:
+                messagebox.showerror("Error", f"Batch processing failed:\n{e}")
+                return
+            if result["total"] == 0:
+                messagebox.showinfo("Info", "No supported audio files found")
+            else:
+                messagebox.showinfo("Complete", f"Processed {result['processed']}/{result['total']} files"
+                                                f" into {result['outputs']} output files")
+        finally:
+            self.finish_processing()
+
+    def update_progress(self, done, total):
+        self.root.after(0, lambda: self.progress.config(maximum=max(total, 1), value=done))
+
+    def finish_processing(self):
+        # Called from the worker thread when its run is over; only then can a new run start
+        def release():
+            self.processing = False
+            self.start_btn.config(text="Start Processing", state="normal")
+        self.root.after(0, release)
+
+    def start_processing(self):
+        if not self.processing:
+            self.processing = True
+            # Each run gets its own stop flag, so stopping one run cannot cancel the next
+            self.stop_event = threading.Event()
+            self.start_btn.config(text="Stop Processing")
+            threading.Thread(target=self.batch_process, args=(self.stop_event,), daemon=True).start()
+        else:
+            # The run cancels its pending files; the button comes back when its thread ends
+            self.stop_event.set()
+            self.start_btn.config(text="Stopping...", state="disabled")
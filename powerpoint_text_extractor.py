@@ -0,0 +1,83 @@
+import os
+import pptx
+import nltk
+from langdetect import detect, DetectorFactory
+from langdetect.lang_detect_exception import LangDetectException
+from instrumentation import stage
+
+# Ensure consistent language detection
+DetectorFactory.seed = 0
+
+# Lazy initialization of NLTK data
+def ensure_nltk_data():
+    """
+    Check if the 'punkt' tokenizer is available. Download it if it's missing.
+    """
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+
+# Extracts text from a PowerPoint file
+def extract_text_from_pptx(pptx_path):
+    presentation = pptx.Presentation(pptx_path)
+    texts = []
+    for slide in presentation.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                texts.append(shape.text.strip())
+    return texts
+
+def filter_text_by_language(texts, selected_lang, filter_numeric=False, threshold=10, perform_detection=True):
+    filtered_sentences = []
+    filtered_words = []
+    for text in texts:
+        lines = text.split("\n")
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if filter_numeric and line.isdigit():
+                continue
+            if perform_detection and len(line) >= threshold:
+                try:
+                    if detect(line) != selected_lang:
+                        continue
+                except LangDetectException:
+                    continue
+            if line and line[-1] in ".!?":
+                filtered_sentences.append(line)
+            else:
+                filtered_words.append(line)
+    return filtered_sentences, filtered_words
+
+# Save the extracted text to a file
+def save_to_file(filename, data, add_spacing=False):
+    with open(filename, "w", encoding="utf-8") as file:
+        for item in data:
+            file.write(item + "\n")
+            if add_spacing:
+                file.write("\n")
+
+def extract_to_folder(pptx_path, output_folder, selected_lang, separate_sentences_words, filter_numeric, threshold, language_detection,
+                      metrics=None):
+    # Writes sentences.txt/words.txt (or text.txt) and returns the (sentences, words) lists
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    with stage(metrics, "parse"):
+        texts = extract_text_from_pptx(pptx_path)
+    with stage(metrics, "filter"):
+        sentences, words = filter_text_by_language(
+            texts,
+            selected_lang,
+            filter_numeric=filter_numeric,
+            threshold=threshold,
+            perform_detection=language_detection
+        )
+    with stage(metrics, "write"):
+        if separate_sentences_words:
+            save_to_file(os.path.join(output_folder, "sentences.txt"), sentences, add_spacing=True)
+            save_to_file(os.path.join(output_folder, "words.txt"), words)
+        else:
+            save_to_file(os.path.join(output_folder, "text.txt"), sentences + words)
+    return sentences, words
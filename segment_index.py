@@ -0,0 +1,130 @@
+import os
+import csv
+import json
+from silence_detection import ms_to_frames
+from wav_mmap import MappedWav
+
+# Index-only splitter output: instead of segment_N.wav files, one segments.json/.csv/.cue
+# lists every segment as frame offsets into the source WAV, with the padding and gain the
+# file export would have applied. SegmentReader serves the segments as views of the source.
+
+INDEX_FORMATS = ("json", "csv", "cue")
+RECORD_FIELDS = ["segment", "start_frame", "end_frame", "start_ms", "end_ms",
+                 "pad_begin_ms", "pad_end_ms", "gain_db"]
+CUE_FRAMES_PER_SECOND = 75
+
+def segment_record(number, bounds, frame_rate, gain_db):
+    # bounds is a (seg_start, seg_end, speech_start, speech_end) tuple in ms from
+    # audio_splitter.speech_segments; frames are computed the way pydub slices
+    seg_start, seg_end, speech_start, speech_end = bounds
+    start_frame, end_frame = ms_to_frames([seg_start, seg_end], frame_rate)
+    return {
+        "segment": number,
+        "start_frame": int(start_frame),
+        "end_frame": int(end_frame),
+        "start_ms": seg_start,
+        "end_ms": seg_end,
+        "pad_begin_ms": speech_start - seg_start,
+        "pad_end_ms": seg_end - speech_end,
+        "gain_db": gain_db,
+    }
+
+def cue_time(ms):
+    frames = ms * CUE_FRAMES_PER_SECOND // 1000
+    seconds, frames = divmod(frames, CUE_FRAMES_PER_SECOND)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}:{frames:02d}"
+
+def write_segment_index(path, index_format, source_path, wav, segments):
+    source = os.path.abspath(source_path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if index_format == "json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": source,
+                "frame_rate": wav.frame_rate,
+                "channels": wav.channels,
+                "sample_width": wav.source_width,
+                "frames": wav.frames,
+                "segments": segments,
+            }, f, indent=2)
+    elif index_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["source"] + RECORD_FIELDS)
+            writer.writeheader()
+            for record in segments:
+                writer.writerow(dict(record, source=source))
+    elif index_format == "cue":
+        # CUE INDEX times only resolve 1/75 s, so the exact frames go into REM lines
+        lines = [f'FILE "{source}" WAVE']
+        for record in segments:
+            lines.append(f"  TRACK {record['segment']:02d} AUDIO")
+            lines.append(f'    TITLE "segment_{record["segment"]}"')
+            for field in RECORD_FIELDS[1:]:
+                lines.append(f"    REM {field.upper()} {record[field]}")
+            lines.append(f"    INDEX 01 {cue_time(record['start_ms'])}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        raise ValueError(f"Unsupported index format: {index_format}")
+
+def parse_field(field, value):
+    return float(value) if field == "gain_db" else int(value)
+
+def load_segment_index(path):
+    # Returns {"source": path, "segments": [record, ...]} for any of the INDEX_FORMATS
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        return {"source": index["source"], "segments": index["segments"]}
+    if extension == ".csv":
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return {
+            "source": rows[0]["source"] if rows else None,
+            "segments": [{field: parse_field(field, row[field]) for field in RECORD_FIELDS} for row in rows],
+        }
+    if extension == ".cue":
+        source = None
+        segments = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                words = line.split()
+                if words and words[0] == "FILE":
+                    source = line.strip()[len("FILE "):].rsplit(" ", 1)[0].strip('"')
+                elif words and words[0] == "TRACK":
+                    segments.append({"segment": int(words[1])})
+                elif len(words) == 3 and words[0] == "REM" and words[1].lower() in RECORD_FIELDS:
+                    field = words[1].lower()
+                    segments[-1][field] = parse_field(field, words[2])
+        return {"source": source, "segments": segments}
+    raise ValueError(f"Unsupported index format: {path}")
+
+class SegmentReader:
+    # reader[i] is segment i+1 of an index as a zero-copy (frames, channels) view of the
+    # memory-mapped source, in the file's own sample format (see MappedWav.frames_view).
+    # Gain and the zero padding pydub adds past the end of the file are not applied.
+    def __init__(self, index_path):
+        index = load_segment_index(index_path)
+        self.segments = index["segments"]
+        self.wav = MappedWav(index["source"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __getitem__(self, i):
+        record = self.segments[i]
+        return self.wav.frames_view(record["start_frame"], min(record["end_frame"], self.wav.frames))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.wav.close()
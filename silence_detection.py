@@ -0,0 +1,136 @@
+import numpy as np
+
+# Vectorized replacement for pydub.silence.detect_silence. The file is reduced once to a
+# per-millisecond energy envelope (sum of squared samples between pydub's millisecond
+# frame boundaries); every min_silence_len window is then a difference of its cumulative
+# sum, so detection costs O(length) regardless of the window length and returns exactly
+# the [start, end] ranges pydub would.
+
+ENVELOPE_BLOCK_MS = 10000
+
+def samples_from_raw(data, sample_width):
+    # Interleaved signed PCM samples, read the way audioop reads them
+    if sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        return np.where(samples & 0x800000, samples - 0x1000000, samples)
+    return np.frombuffer(data, dtype={1: np.int8, 2: '<i2', 4: '<i4'}[sample_width])
+
+def duration_ms(frames, frame_rate):
+    # len() of an AudioSegment with this many frames
+    return round(1000 * (frames / frame_rate))
+
+def ms_to_frames(ms, frame_rate):
+    # Frame index of millisecond positions, computed like AudioSegment.frame_count(ms=)
+    return (np.asarray(ms) * (frame_rate / 1000.0)).astype(np.int64)
+
+def energy_dtype(sample_width):
+    # Squares of 8/16-bit samples sum exactly in int64, wider samples need floats
+    return np.int64 if sample_width <= 2 else np.float64
+
+def block_energy(samples, channels, local_bounds, dtype):
+    # Sum of squares between consecutive local_bounds (frame indices into samples)
+    squares = samples.astype(dtype).reshape(-1, channels)
+    squares *= squares
+    cumulative = np.zeros(len(squares) + 1, dtype=dtype)
+    np.cumsum(squares.sum(axis=1), out=cumulative[1:])
+    return cumulative[local_bounds[1:]] - cumulative[local_bounds[:-1]]
+
+def envelope_blocks(read, frames, channels, frame_rate, sample_width, block_ms=ENVELOPE_BLOCK_MS):
+    # Yields the energy envelope block_ms at a time; read(first, last) returns the
+    # interleaved samples of frames [first, last), so the source can be a file or a map
+    dtype = energy_dtype(sample_width)
+    length_ms = duration_ms(frames, frame_rate)
+    for ms_start in range(0, length_ms, block_ms):
+        ms_end = min(ms_start + block_ms, length_ms)
+        bounds = np.minimum(ms_to_frames(np.arange(ms_start, ms_end + 1), frame_rate), frames)
+        yield block_energy(read(bounds[0], bounds[-1]), channels, bounds - bounds[0], dtype)
+
+def envelope_from_samples(samples, channels, frame_rate, sample_width):
+    frames = len(samples) // channels
+    blocks = envelope_blocks(lambda first, last: samples[first * channels:last * channels],
+                             frames, channels, frame_rate, sample_width)
+    return {
+        "energy": np.concatenate([np.zeros(0, dtype=energy_dtype(sample_width))] + list(blocks)),
+        "frames": frames,
+        "channels": channels,
+        "frame_rate": frame_rate,
+        "sample_width": sample_width,
+    }
+
+def energy_envelope(audio):
+    # audio is a pydub AudioSegment; its raw data is read without copying
+    return envelope_from_samples(samples_from_raw(audio.raw_data, audio.sample_width),
+                                 audio.channels, audio.frame_rate, audio.sample_width)
+
+def window_rms(sums, starts, window_ms, frames, channels, frame_rate):
+    # audioop.rms of the window_ms slices at starts, given their sums of squares. Slices
+    # running past the data are zero-padded to full length, unless they start past it.
+    first = ms_to_frames(starts, frame_rate)
+    counts = np.where(first < frames, ms_to_frames(starts + window_ms, frame_rate) - first, 0) * channels
+    mean = np.zeros(len(starts))
+    np.divide(sums, counts, out=mean, where=counts > 0)
+    return np.floor(np.sqrt(mean))
+
+class SilenceStream:
+    # detect_silence over an envelope that arrives in blocks. feed() returns the ranges
+    # that can no longer grow and finish() the rest, so only min_silence_len ms of
+    # envelope is held between blocks.
+    def __init__(self, frames, channels, frame_rate, sample_width, min_silence_len, silence_thresh):
+        self.frames = frames
+        self.channels = channels
+        self.frame_rate = frame_rate
+        self.window = min_silence_len
+        self.last_start = duration_ms(frames, frame_rate) - min_silence_len
+        self.threshold = 10 ** (silence_thresh / 20.0) * (2 ** (sample_width * 8) / 2)
+        self.pending = np.zeros(0, dtype=energy_dtype(sample_width))
+        self.next_start = 0
+        self.first = None
+        self.prev = None
+
+    def feed(self, energy, final=False):
+        pending = np.concatenate((self.pending, energy))
+        last = self.last_start
+        if not final:
+            last = min(last, self.next_start + len(pending) - max(self.window, 1))
+        ranges = []
+        if last >= self.next_start:
+            starts = np.arange(self.next_start, last + 1)
+            cumulative = np.zeros(len(pending) + 1, dtype=pending.dtype)
+            np.cumsum(pending, out=cumulative[1:])
+            sums = cumulative[self.window:self.window + len(starts)] - cumulative[:len(starts)]
+            rms = window_rms(sums, starts, self.window, self.frames, self.channels, self.frame_rate)
+            ranges = self.merge(starts[rms <= self.threshold])
+            pending = pending[last + 1 - self.next_start:]
+            self.next_start = last + 1
+        self.pending = pending
+        return ranges
+
+    def merge(self, starts):
+        # Silent starts stay in one range unless they are non-consecutive and further
+        # apart than a window, the way pydub merges them
+        if not len(starts):
+            return []
+        if self.first is None:
+            self.first = starts[0]
+        else:
+            starts = np.concatenate(([self.prev], starts))
+        gaps = np.diff(starts)
+        ranges = []
+        for i in np.flatnonzero((gaps != 1) & (gaps > self.window)):
+            ranges.append([int(self.first), int(starts[i]) + self.window])
+            self.first = starts[i + 1]
+        self.prev = starts[-1]
+        return ranges
+
+    def finish(self):
+        ranges = self.feed(self.pending[:0], final=True)
+        if self.first is not None:
+            ranges.append([int(self.first), int(self.prev) + self.window])
+            self.first = None
+        return ranges
+
+def detect_silence(envelope, min_silence_len=1000, silence_thresh=-16):
+    stream = SilenceStream(envelope["frames"], envelope["channels"], envelope["frame_rate"],
+                           envelope["sample_width"], min_silence_len, silence_thresh)
+    return stream.feed(envelope["energy"]) + stream.finish()
@@ -0,0 +1,144 @@
+import numpy as np
+from scipy.signal import stft, istft, filtfilt, fftconvolve
+from instrumentation import stage
+
+# noisereduce.reduce_noise defaults, so results match the per-channel calls this replaces
+TIME_CONSTANT_S = 2.0
+FREQ_MASK_SMOOTH_HZ = 500
+TIME_MASK_SMOOTH_MS = 50
+THRESH_N_MULT_NONSTATIONARY = 2
+N_STD_THRESH_STATIONARY = 1.5
+SIGMOID_SLOPE_NONSTATIONARY = 10
+CHUNK_SIZE = 600000
+PADDING = 30000
+# Upper bound on STFT bins gated at once; channels are batched up to this size
+MAX_BATCH_BINS = 2 ** 23
+
+def smoothing_filter(sr, n_fft, hop_length):
+    n_grad_freq = int(FREQ_MASK_SMOOTH_HZ / (sr / (n_fft / 2)))
+    if n_grad_freq < 1:
+        raise ValueError(f"freq_mask_smooth_hz needs to be at least {int(sr / (n_fft / 2))}Hz")
+    n_grad_time = int(TIME_MASK_SMOOTH_MS / ((hop_length / sr) * 1000))
+    if n_grad_time < 1:
+        raise ValueError(f"time_mask_smooth_ms needs to be at least {int((hop_length / sr) * 1000)}ms")
+    if n_grad_freq == 1 and n_grad_time == 1:
+        return None
+    freq_ramp = np.concatenate([np.linspace(0, 1, n_grad_freq + 1, endpoint=False),
+                                np.linspace(1, 0, n_grad_freq + 2)])[1:-1]
+    time_ramp = np.concatenate([np.linspace(0, 1, n_grad_time + 1, endpoint=False),
+                                np.linspace(1, 0, n_grad_time + 2)])[1:-1]
+    smoothing = np.outer(freq_ramp, time_ramp)
+    return smoothing / np.sum(smoothing)
+
+def amp_to_db(x, top_db=80.0):
+    x_db = 20 * np.log10(np.abs(x) + np.finfo(np.float64).eps)
+    return np.maximum(x_db, np.max(x_db, axis=-1, keepdims=True) - top_db)
+
+def compute_noise_profile(noise, sr, n_fft=2048, win_length=None, hop_length=None):
+    # Spectral statistics of a (channels, frames) noise sample, collapsed to one channel
+    # like noisereduce's stationary gate. The result is plain arrays and numbers so it
+    # can be saved to disk and shipped to worker processes.
+    if win_length is None:
+        win_length = n_fft
+    if hop_length is None:
+        hop_length = win_length // 4
+    noise = np.mean(np.atleast_2d(noise), axis=0)[:CHUNK_SIZE]
+    _, _, noise_stft = stft(noise, nfft=n_fft, noverlap=win_length - hop_length,
+                            nperseg=win_length, padded=False)
+    noise_stft_db = amp_to_db(noise_stft)
+    return {
+        "sr": int(sr),
+        "n_fft": int(n_fft),
+        "win_length": int(win_length),
+        "hop_length": int(hop_length),
+        "mean_db": np.mean(noise_stft_db, axis=1),
+        "std_db": np.std(noise_stft_db, axis=1),
+    }
+
+def mask_stationary(sig_stft, noise_thresh, prop_decrease, smoothing):
+    # Batched version of noisereduce's stationary mask with a precomputed threshold per bin
+    dtype = sig_stft.real.dtype
+    sig_mask = (amp_to_db(sig_stft) > noise_thresh[:, np.newaxis]).astype(dtype)
+    sig_mask *= prop_decrease
+    sig_mask += 1.0 - prop_decrease
+    if smoothing is not None:
+        sig_mask = fftconvolve(sig_mask, smoothing[np.newaxis].astype(dtype), mode="same", axes=(1, 2))
+    return sig_mask
+
+def mask_nonstationary(sig_stft, sr, prop_decrease, hop_length, smoothing):
+    # sig_stft is (channels, freqs, frames); every channel is masked in one batched computation
+    dtype = sig_stft.real.dtype
+    abs_sig_stft = np.abs(sig_stft)
+    t_frames = TIME_CONSTANT_S * sr / float(hop_length)
+    b = (np.sqrt(1 + 4 * t_frames ** 2) - 1) / (2 * t_frames ** 2)
+    sig_stft_smooth = filtfilt(np.array([b], dtype), np.array([1, b - 1], dtype), abs_sig_stft,
+                               axis=-1, padtype=None)
+    sig_mult_above_thresh = (abs_sig_stft - sig_stft_smooth) / sig_stft_smooth
+    del abs_sig_stft, sig_stft_smooth
+    sig_mask = 1 / (1 + np.exp(-(sig_mult_above_thresh - THRESH_N_MULT_NONSTATIONARY)
+                               * SIGMOID_SLOPE_NONSTATIONARY))
+    del sig_mult_above_thresh
+    if smoothing is not None:
+        sig_mask = fftconvolve(sig_mask, smoothing[np.newaxis].astype(dtype), mode="same", axes=(1, 2))
+    sig_mask *= prop_decrease
+    sig_mask += 1.0 - prop_decrease
+    return sig_mask
+
+def gate_chunk(chunk, mask, n_fft, win_length, hop_length, metrics=None):
+    # chunk is (channels, frames) and goes through one batched STFT/ISTFT in chunk.dtype
+    noverlap = win_length - hop_length
+    with stage(metrics, "stft"):
+        _, _, sig_stft = stft(chunk, nfft=n_fft, noverlap=noverlap, nperseg=win_length, padded=False)
+    with stage(metrics, "gating"):
+        sig_stft *= mask(sig_stft)
+    with stage(metrics, "stft"):
+        _, denoised = istft(sig_stft, nfft=n_fft, noverlap=noverlap, nperseg=win_length)
+    result = np.zeros(chunk.shape, chunk.dtype)
+    length = min(denoised.shape[-1], chunk.shape[-1])
+    result[:, :length] = denoised[:, :length]
+    return result
+
+def reduce_noise(y, sr, prop_decrease=1.0, n_fft=2048, win_length=None, hop_length=None,
+                 dtype=np.float64, noise_profile=None, metrics=None):
+    # Same zero-padded chunking as noisereduce, but all channels of a chunk are gated together.
+    # dtype is the working precision; noisereduce always works in float64. Without a
+    # noise_profile the adaptive non-stationary gate is used, with one the stationary gate.
+    if win_length is None:
+        win_length = n_fft
+    if hop_length is None:
+        hop_length = win_length // 4
+    smoothing = smoothing_filter(sr, n_fft, hop_length)
+    if noise_profile is None:
+        def mask(sig_stft):
+            return mask_nonstationary(sig_stft, sr, prop_decrease, hop_length, smoothing)
+    else:
+        expected = {"sr": sr, "n_fft": n_fft, "win_length": win_length, "hop_length": hop_length}
+        for key, value in expected.items():
+            if noise_profile[key] != value:
+                raise ValueError(f"Noise profile was captured with {key}={noise_profile[key]}, "
+                                 f"but this file needs {key}={value}")
+        noise_thresh = noise_profile["mean_db"] + noise_profile["std_db"] * N_STD_THRESH_STATIONARY
+        noise_thresh = noise_thresh.astype(dtype)
+
+        def mask(sig_stft):
+            return mask_stationary(sig_stft, noise_thresh, prop_decrease, smoothing)
+
+    n_channels, n_frames = y.shape
+    bins_per_channel = (n_fft // 2 + 1) * ((CHUNK_SIZE + 2 * PADDING) // hop_length + 1)
+    channels_per_batch = max(1, MAX_BATCH_BINS // bins_per_channel)
+    # The result keeps the working precision, not the input's (librosa loads float32)
+    output = np.empty(y.shape, dtype)
+    for start in range(0, n_frames, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, n_frames)
+        # Like noisereduce, a multi-chunk signal zero-fills its last chunk to full size
+        chunk_length = CHUNK_SIZE if n_frames > CHUNK_SIZE else end - start
+        padded_start = start - PADDING
+        read_start = max(0, padded_start)
+        read_end = min(n_frames, end + PADDING)
+        for c0 in range(0, n_channels, channels_per_batch):
+            c1 = min(c0 + channels_per_batch, n_channels)
+            chunk = np.zeros((c1 - c0, chunk_length + 2 * PADDING), dtype)
+            chunk[:, read_start - padded_start:read_end - padded_start] = y[c0:c1, read_start:read_end]
+            gated = gate_chunk(chunk, mask, n_fft, win_length, hop_length, metrics)
+            output[c0:c1, start:end] = gated[:, PADDING:PADDING + end - start]
+    return output
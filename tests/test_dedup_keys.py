@@ -0,0 +1,29 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_keys import KeyIndex, key_hashes
+
+def test_swapped_columns_hash_differently():
+    a = pd.Series(np.arange(1000))
+    b = pd.Series(np.arange(1000) + 5000)
+    primary_ab, check_ab = key_hashes([a, b])
+    primary_ba, check_ba = key_hashes([b, a])
+    assert not np.any(primary_ab == primary_ba)
+    assert not np.any(check_ab == check_ba)
+
+def test_equal_columns_keep_distinct_hashes():
+    keys = pd.Series(np.arange(20000))
+    primary, check = key_hashes([keys, keys])
+    assert len(np.unique(primary)) == len(keys)
+    assert len(np.unique(check)) == len(keys)
+
+def test_equal_columns_dedup():
+    keys = pd.Series(np.tile(np.arange(500), 2))
+    with KeyIndex() as index:
+        mask = index.first_seen(*key_hashes([keys, keys]))
+    assert mask.sum() == 500
+    assert mask[:500].all()
@@ -0,0 +1,36 @@
+import os
+import sys
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_duplicate_remover import stream_remove_duplicates
+
+def assert_streaming_matches_read_excel(tmp_path, rows):
+    source, output = str(tmp_path / "in.xlsx"), str(tmp_path / "out.xlsx")
+    workbook = Workbook()
+    for row in [("key", "value")] + rows:
+        workbook.active.append(row)
+    workbook.save(source)
+    result = stream_remove_duplicates(source, output, ["key"])
+    df = pd.read_excel(source)
+    assert result["rows_in"] == len(df)
+    expected = df.drop_duplicates(subset=["key"]).reset_index(drop=True)
+    assert result["rows_out"] == len(expected)
+    pd.testing.assert_frame_equal(pd.read_excel(output), expected)
+
+def test_streaming_treats_na_strings_like_read_excel(tmp_path):
+    assert_streaming_matches_read_excel(tmp_path, [("NA", 1), ("N/A", 2), (None, 3), ("null", 4), (" NA", 5), ("a", 6)])
+
+def test_streaming_keeps_inner_blank_rows_like_read_excel(tmp_path):
+    # The blank row is the first row with an empty key; the trailing blank rows are dropped
+    assert_streaming_matches_read_excel(tmp_path, [("a", 1), (None, None), (None, 2), ("a", 3), ("b", 4), (None, None)])
+
+def test_streaming_rejects_other_output_types(tmp_path):
+    source = str(tmp_path / "in.xlsx")
+    Workbook().save(source)
+    with pytest.raises(ValueError):
+        stream_remove_duplicates(source, str(tmp_path / "out.csv"), ["key"])
+    assert not os.path.exists(tmp_path / "out.csv")
@@ -0,0 +1,357 @@
+import io
+import os
+import re
+import csv
+import math
+import time
+import queue
+import shutil
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+from gtts import gTTS
+from instrumentation import stage
+from tts_cache import cache_key, copy_file
+
+# The engine's MP3 is decoded and resampled in memory. wav is then written by libsndfile
+# without ffmpeg; m4a and mp3 go to ffmpeg's AAC and LAME encoders, whole batches of lines
+# through one process (see BatchEncoder).
+
+SOUNDFILE_FORMATS = {
+    "wav": {"format": "WAV", "subtype": "PCM_16"},
+}
+FFMPEG_FORMATS = {
+    "m4a": {"format": "mp4", "parameters": ["-c:a", "aac", "-b:a", "128k"]},
+    "mp3": {"format": "mp3", "parameters": ["-c:a", "libmp3lame", "-b:a", "128k"]},
+}
+FORMAT_PARAMS = {**SOUNDFILE_FORMATS, **FFMPEG_FORMATS}
+OUTPUT_CHANNELS = 2
+OUTPUT_FRAME_RATE = 44100
+ENCODE_BATCH_SIZE = 32
+ENCODE_BATCH_WAIT = 1.0  # seconds a batch waits for more lines
+PENDING_PER_WORKER = 4  # entries read ahead per worker
+REPEAT_WINDOW = 10000  # finished texts remembered for copying to later repeats
+CSV_SNIFF_BYTES = 4096
+
+def gtts_engine(text, lang, fp):
+    tts = gTTS(text=text, lang=lang)
+    tts.write_to_fp(fp)
+
+class RateLimiter:
+    # Spaces out calls from any number of threads to at most per_second calls per second
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def synthesize(engine, text, lang, limiter, retries, backoff):
+    # Returns the engine's MP3 bytes; retries a failed call after backoff, 2 * backoff,
+    # 4 * backoff ... seconds
+    for attempt in range(retries + 1):
+        limiter.wait()
+        buffer = io.BytesIO()
+        try:
+            engine(text, lang, buffer)
+            return buffer.getvalue()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def line_filename(i, line):
+    return f"{i:02d}-{line.split()[0]}"
+
+def safe_filename(name):
+    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).rstrip(". ") or "_"
+
+def engine_name(engine):
+    # Identifies the engine in cache keys; functools.partial keeps its keywords
+    func = getattr(engine, "func", engine)
+    name = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    keywords = getattr(engine, "keywords", None)
+    return f"{name}{sorted(keywords.items())}" if keywords else name
+
+def decode_mp3(data):
+    # Float samples at the output rate and channel count, clipped for the integer encoders
+    samples, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    if sr != OUTPUT_FRAME_RATE:
+        factor = math.gcd(sr, OUTPUT_FRAME_RATE)
+        samples = resample_poly(samples, OUTPUT_FRAME_RATE // factor, sr // factor, axis=0)
+    if samples.shape[1] != OUTPUT_CHANNELS:
+        samples = np.repeat(samples.mean(axis=1, keepdims=True), OUTPUT_CHANNELS, axis=1)
+    return np.clip(samples, -1.0, 1.0).astype(np.float32)
+
+def ffmpeg_encode(items, params):
+    # Encodes several (samples, path) items with one ffmpeg process: the samples go to stdin
+    # as one stream and atrim cuts it back into one output file per item
+    bounds = np.cumsum([0] + [len(samples) for samples, _ in items])
+    graph = [f"[0:a]asplit={len(items)}" + "".join(f"[s{k}]" for k in range(len(items)))]
+    for k in range(len(items)):
+        graph.append(f"[s{k}]atrim=start_sample={bounds[k]}:end_sample={bounds[k + 1]},"
+                     f"asetpts=PTS-STARTPTS[o{k}]")
+    command = [shutil.which("ffmpeg") or "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+               "-f", "f32le", "-ar", str(OUTPUT_FRAME_RATE), "-ac", str(OUTPUT_CHANNELS), "-i", "pipe:0",
+               "-filter_complex", ";".join(graph)]
+    for k, (_, path) in enumerate(items):
+        command += ["-map", f"[o{k}]"] + params["parameters"] + ["-f", params["format"], path]
+    data = np.concatenate([samples for samples, _ in items]).astype("<f4").tobytes()
+    completed = subprocess.run(command, input=data, capture_output=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode(errors="replace").strip() or "ffmpeg failed")
+
+class BatchEncoder:
+    # Collects lines from the worker threads and encodes them on its own thread, up to
+    # batch_size lines per ffmpeg process. submit() returns a Future of the written path.
+    def __init__(self, output_format, batch_size=ENCODE_BATCH_SIZE, batch_wait=ENCODE_BATCH_WAIT,
+                 metrics=None):
+        self.params = FFMPEG_FORMATS[output_format]
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=2 * batch_size)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, samples, path):
+        future = Future()
+        self.queue.put((samples, path, future))
+        return future
+
+    def run(self):
+        closed = False
+        while not closed:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closed = True
+                    break
+                batch.append(item)
+            self.encode(batch)
+
+    def encode(self, batch):
+        try:
+            with stage(self.metrics, "encode"):
+                ffmpeg_encode([(samples, path) for samples, path, _ in batch], self.params)
+        except Exception as e:
+            for _, path, future in batch:
+                future.set_exception(RuntimeError(f"Error encoding {os.path.basename(path)}:\n{e}"))
+        else:
+            for _, path, future in batch:
+                future.set_result(path)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+def line_cache_key(line, lang, engine, output_format):
+    return cache_key(line, lang, engine_name(engine), output_format, FORMAT_PARAMS[output_format],
+                     OUTPUT_CHANNELS, OUTPUT_FRAME_RATE)
+
+def convert_line(i, line, lang, path, output_format, engine, limiter, retries, backoff, metrics,
+                 cache=None, encoder=None):
+    # Writes line to path and returns path, or a Future of it when encoder writes the file;
+    # raises with the message for on_error
+    if cache is not None:
+        with stage(metrics, "cache"):
+            if cache.get(line_cache_key(line, lang, engine, output_format), path):
+                return path
+    try:
+        with stage(metrics, "synthesize"):
+            data = synthesize(engine, line, lang, limiter, retries, backoff)
+    except Exception as e:
+        raise RuntimeError(f"Error converting line {i}:\n{e}") from e
+
+    try:
+        with stage(metrics, "decode"):
+            samples = decode_mp3(data)
+        if encoder is not None:
+            return encoder.submit(samples, path)
+        with stage(metrics, "encode"):
+            sf.write(path, samples, OUTPUT_FRAME_RATE, **SOUNDFILE_FORMATS[output_format])
+    except Exception as e:
+        raise RuntimeError(f"Error converting file for line {i}:\n{e}") from e
+    return path
+
+def convert_entries(entries, output_dir, output_format="wav", progress=None, on_error=None,
+                    on_written=None, engine=gtts_engine, metrics=None, workers=1, rate_limit=None,
+                    retries=2, backoff=1.0, cache=None, total=None, log=None):
+    # Converts (number, text, filename, lang) entries, as made by line_entries and
+    # file_entries, to <filename>.<format> in output_dir; returns the number of files
+    # written. Entries are taken from the iterator only as workers become free, so memory
+    # does not grow with the input. Lines are synthesized by up to workers threads, with at
+    # most rate_limit engine calls per second and retries after a failed call.
+    # on_written(number, path), on_error(number, message) and progress(done, total) are
+    # called from the calling thread as entries finish. A text repeated while it is being
+    # converted, or within REPEAT_WINDOW finished texts, is copied instead of converted
+    # again; with a tts_cache.TTSCache, texts converted in earlier runs are too. A file that
+    # cannot be added to the cache is only reported to log(message); the run goes on.
+    # engine(text, lang, fp) writes the MP3 of one line to the binary file fp and can be
+    # replaced by a local stand-in.
+    if output_format not in FORMAT_PARAMS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    os.makedirs(output_dir, exist_ok=True)
+    progress = progress or (lambda done, total: None)
+    on_error = on_error or (lambda number, message: None)
+    on_written = on_written or (lambda number, path: None)
+    log = log or (lambda message: None)
+    limiter = RateLimiter(rate_limit)
+    encoder = BatchEncoder(output_format, metrics=metrics) if output_format in FFMPEG_FORMATS else None
+    max_converting = max(1, workers) * PENDING_PER_WORKER
+    entries = iter(entries)
+    exhausted = False
+    pending = {}  # future -> ((text, lang), whether the batch encoder has the line)
+    encoding = 0  # those are not counted against max_converting
+    waiting = {}  # (text, lang) -> [(number, path)] of the entry being converted and its repeats
+    recent = OrderedDict()  # (text, lang) -> path of recently finished texts
+    done = written = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while pending or not exhausted:
+                while not exhausted and len(pending) - encoding < max_converting:
+                    entry = next(entries, None)
+                    if entry is None:
+                        exhausted = True
+                        break
+                    number, text, filename, lang = entry
+                    path = os.path.join(output_dir, f"{filename}.{output_format}")
+                    key = (text, lang)
+                    if key in waiting:
+                        waiting[key].append((number, path))
+                    elif key in recent:
+                        recent.move_to_end(key)
+                        copy_file(recent[key], path)
+                        if cache is not None:
+                            cache.record_hit()
+                        on_written(number, path)
+                        done += 1
+                        written += 1
+                        progress(done, total)
+                    else:
+                        waiting[key] = [(number, path)]
+                        future = executor.submit(convert_line, number, text, lang, path, output_format,
+                                                 engine, limiter, retries, backoff, metrics, cache, encoder)
+                        pending[future] = (key, False)
+                if not pending:
+                    continue
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, encoded = pending.pop(future)
+                    encoding -= encoded
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = e
+                    if isinstance(result, Future):
+                        # Handed to the batch encoder; finishes when its batch is written
+                        encoding += 1
+                        pending[result] = (key, True)
+                        continue
+                    (number, path), *repeats = waiting.pop(key)
+                    if isinstance(result, Exception):
+                        for repeat_number, _ in [(number, path)] + repeats:
+                            on_error(repeat_number, str(result))
+                    else:
+                        if cache is not None:
+                            try:
+                                with stage(metrics, "cache"):
+                                    cache.put(line_cache_key(key[0], key[1], engine, output_format), path)
+                            except OSError as e:
+                                log(f"Line {number} was written but not cached: {e}")
+                        recent[key] = path
+                        if len(recent) > REPEAT_WINDOW:
+                            recent.popitem(last=False)
+                        on_written(number, path)
+                        for repeat_number, repeat_path in repeats:
+                            copy_file(path, repeat_path)
+                            if cache is not None:
+                                cache.record_hit()
+                            on_written(repeat_number, repeat_path)
+                        written += 1 + len(repeats)
+                    done += 1 + len(repeats)
+                    progress(done, total)
+    finally:
+        if encoder is not None:
+            encoder.close()
+    return written
+
+def line_entries(lines, lang="de"):
+    # Entries of the non-empty lines, named <NN>-<first word> by line number
+    for i, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line:
+            yield i, line, line_filename(i, line), lang
+
+def csv_reader(f):
+    sample = f.read(CSV_SNIFF_BYTES)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return csv.DictReader(f, dialect=dialect)
+
+def csv_columns(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return csv_reader(f).fieldnames or []
+
+def file_entries(path, lang="de", text_column=None, key_column=None, lang_column=None):
+    # Entries read lazily from a UTF-8 text file, one per line, or from a .csv file with a
+    # header row. For a CSV, text_column defaults to the first column, key_column names the
+    # output files instead of <NN>-<first word>, and lang_column overrides lang per row;
+    # rows are numbered from 1 below the header.
+    if os.path.splitext(path)[1].lower() != ".csv":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            yield from line_entries(f, lang)
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv_reader(f)
+        columns = reader.fieldnames or []
+        text_column = text_column or (columns[0] if columns else None)
+        for column in (text_column, key_column, lang_column):
+            if column and column not in columns:
+                raise ValueError(f"Column not found in {os.path.basename(path)}: {column}")
+        for i, row in enumerate(reader, start=1):
+            text = (row[text_column] or "").strip()
+            if not text:
+                continue
+            key = (row[key_column] or "").strip() if key_column else ""
+            row_lang = (row[lang_column] or "").strip() if lang_column else ""
+            yield i, text, safe_filename(key) if key else line_filename(i, text), row_lang or lang
+
+def count_entries(entries):
+    return sum(1 for _ in entries)
+
+def convert_lines(lines, output_dir, output_format="wav", lang="de", progress=None, on_error=None,
+                  engine=gtts_engine, metrics=None, workers=1, rate_limit=None, retries=2, backoff=1.0,
+                  cache=None, log=None):
+    # convert_entries for a list of lines, converting each non-empty line to
+    # <NN>-<first word>.<format> where NN is the line number; returns the written paths in
+    # line order
+    written = {}
+    convert_entries(line_entries(lines, lang), output_dir, output_format, progress=progress,
+                    on_error=on_error, on_written=written.__setitem__, engine=engine, metrics=metrics,
+                    workers=workers, rate_limit=rate_limit, retries=retries, backoff=backoff,
+                    cache=cache, total=count_entries(line_entries(lines, lang)), log=log)
+    return [written[i] for i in sorted(written)]
@@ -0,0 +1,113 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Finished TTS files, stored under the SHA-256 of everything that determines their bytes
+# (text, language, engine, output format and sample rate). A hit is copied into the
+# output folder instead of synthesizing and encoding the line again. Files are copied
+# rather than hard linked both ways, so editing an output file never changes the cache
+# and refreshing a cache entry never touches an output file. The cache is kept under
+# max_bytes by evicting the least recently used files; recency is the file mtime, which
+# every hit refreshes, so it carries over between runs.
+
+TTS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".omnitoolsuite", "tts")
+DEFAULT_CACHE_MB = 500
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def copy_file(source, dest):
+    # Copies source over dest atomically, so a reader never sees half a file
+    temp_path = dest + ".tmp"
+    shutil.copyfile(source, temp_path)
+    os.replace(temp_path, dest)
+
+class TTSCache:
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()  # path -> size, least recently used first
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self.entries[path] = size
+            self.size += size
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key, dest):
+        # Puts the cached file for key at dest and returns True, or returns False on a miss
+        source = self.path(key, os.path.splitext(dest)[1].lstrip("."))
+        try:
+            copy_file(source, dest)
+            os.utime(source)
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+            if source in self.entries:
+                self.entries.move_to_end(source)
+        return True
+
+    def put(self, key, source):
+        dest = self.path(key, os.path.splitext(source)[1].lstrip("."))
+        if os.path.exists(dest):
+            # Same key, same bytes; get() has already refreshed it
+            return
+        copy_file(source, dest)
+        os.utime(dest)
+        size = os.path.getsize(dest)
+        with self.lock:
+            self.size += size - self.entries.pop(dest, 0)
+            self.entries[dest] = size
+            self.evict()
+
+    def record_hit(self):
+        # A line served without synthesis from another line of the same run
+        with self.lock:
+            self.hits += 1
+
+    def evict(self):
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            path, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            for path in self.entries:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "size_bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
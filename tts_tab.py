@@ -1,26 +1,24 @@
 # tts_tab.py
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from gtts import gTTS
-from pydub import AudioSegment
-import os
-from pydub.utils import which
 import threading  # For running conversion in a separate thread
-import time       # To simulate processing (optional, for smooth updates)
+from text_to_speech import convert_lines, convert_entries, file_entries, count_entries, csv_columns
+from tts_cache import TTSCache, DEFAULT_CACHE_MB
 
-
-AudioSegment.converter = which("ffmpeg")  # Ensure pydub finds ffmpeg
+DEFAULT_WORKERS = 4
+DEFAULT_RATE_LIMIT = 5.0  # engine requests per second
 
 
 class TextToSpeechConverterTab:
     def __init__(self, parent):
         self.frame = ttk.Frame(parent, padding=10)
+        self.root = parent.winfo_toplevel()
         self.build_widgets()
 
     def build_widgets(self):
         self.instruction_label = ttk.Label(
             self.frame, 
-            text="Enter text (each line will be converted to a separate audio file):"
+            text="Enter text or choose a text/CSV file (each line will be converted to a separate audio file):"
         )
         self.instruction_label.grid(row=0, column=0, sticky="w")
 
@@ -28,29 +26,74 @@ class TextToSpeechConverterTab:
         self.text_box.grid(row=1, column=0, pady=5, sticky="nsew")
         self.frame.rowconfigure(1, weight=1)
 
+        # A file is read line by line while converting, so large lists never go through the text box
+        self.input_file_frame = ttk.Frame(self.frame)
+        self.input_file_frame.grid(row=2, column=0, sticky="we", pady=5)
+        ttk.Label(self.input_file_frame, text="Input File:").pack(side=tk.LEFT)
+        self.input_file_var = tk.StringVar()
+        ttk.Entry(self.input_file_frame, textvariable=self.input_file_var, width=40).pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(self.input_file_frame, text="Browse", command=self.select_input_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.input_file_frame, text="Clear", command=self.clear_input_file).pack(side=tk.LEFT)
+
+        self.columns_frame = ttk.Frame(self.frame)
+        self.columns_frame.grid(row=3, column=0, sticky="w", pady=5)
+        self.text_column_var = tk.StringVar()
+        self.key_column_var = tk.StringVar()
+        self.lang_column_var = tk.StringVar()
+        self.column_menus = []
+        for label, variable in (("Text Column:", self.text_column_var), ("Filename Column:", self.key_column_var),
+                                ("Language Column:", self.lang_column_var)):
+            ttk.Label(self.columns_frame, text=label).pack(side=tk.LEFT)
+            menu = ttk.Combobox(self.columns_frame, textvariable=variable, values=[""], state="disabled", width=12)
+            menu.pack(side=tk.LEFT, padx=(5, 15))
+            self.column_menus.append(menu)
+
         self.format_label = ttk.Label(self.frame, text="Select output format:")
-        self.format_label.grid(row=2, column=0, sticky="w", pady=(10, 0))
+        self.format_label.grid(row=4, column=0, sticky="w", pady=(10, 0))
         self.format_var = tk.StringVar(value="wav")
         self.format_options = ["wav", "m4a", "mp3"]
         self.format_menu = ttk.Combobox(
             self.frame, textvariable=self.format_var, values=self.format_options, state="readonly"
         )
-        self.format_menu.grid(row=3, column=0, sticky="w", pady=5)
+        self.format_menu.grid(row=5, column=0, sticky="w", pady=5)
         self.output_folder_label = ttk.Label(self.frame, text="Output Folder:")
-        self.output_folder_label.grid(row=4, column=0, sticky="w")
+        self.output_folder_label.grid(row=6, column=0, sticky="w")
 
         self.output_folder_var = tk.StringVar()
         self.output_folder_entry = ttk.Entry(self.frame, textvariable=self.output_folder_var, width=20)
-        self.output_folder_entry.grid(row=5, column=0, sticky="we", pady=5)
+        self.output_folder_entry.grid(row=7, column=0, sticky="we", pady=5)
         self.select_folder_button = ttk.Button(self.frame, text="Browse", command=self.select_output_folder)
-        self.select_folder_button.grid(row=5, column=1, padx=5)
+        self.select_folder_button.grid(row=7, column=1, padx=5)
+
+        # Lines are synthesized concurrently, within a request rate the TTS service accepts
+        self.concurrency_frame = ttk.Frame(self.frame)
+        self.concurrency_frame.grid(row=8, column=0, sticky="w", pady=5)
+        ttk.Label(self.concurrency_frame, text="Workers:").pack(side=tk.LEFT)
+        self.workers_spinbox = ttk.Spinbox(self.concurrency_frame, from_=1, to=32, width=5)
+        self.workers_spinbox.set(DEFAULT_WORKERS)
+        self.workers_spinbox.pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(self.concurrency_frame, text="Requests/s:").pack(side=tk.LEFT)
+        self.rate_limit_var = tk.StringVar(value=str(DEFAULT_RATE_LIMIT))
+        ttk.Entry(self.concurrency_frame, textvariable=self.rate_limit_var, width=6).pack(side=tk.LEFT, padx=5)
+
+        # Lines converted before are taken from the on-disk cache instead of the TTS service
+        self.cache_frame = ttk.Frame(self.frame)
+        self.cache_frame.grid(row=9, column=0, sticky="w", pady=5)
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.cache_frame, text="Use Cache", variable=self.use_cache_var).pack(side=tk.LEFT)
+        ttk.Label(self.cache_frame, text="Cache Limit (MB):").pack(side=tk.LEFT, padx=(15, 0))
+        self.cache_limit_var = tk.StringVar(value=str(DEFAULT_CACHE_MB))
+        ttk.Entry(self.cache_frame, textvariable=self.cache_limit_var, width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.cache_frame, text="Clear Cache", command=self.clear_cache).pack(side=tk.LEFT, padx=5)
+        self.cache_stats_var = tk.StringVar(value="")
+        ttk.Label(self.frame, textvariable=self.cache_stats_var).grid(row=10, column=0, sticky="w")
 
         # the Progress Bar
         self.progress = ttk.Progressbar(self.frame, length=300, mode="determinate")
-        self.progress.grid(row=6, column=0, columnspan=2,sticky="w", pady=10)
+        self.progress.grid(row=11, column=0, columnspan=2,sticky="w", pady=10)
 
         self.convert_button = ttk.Button(self.frame, text="Convert", command=self.convert_text)
-        self.convert_button.grid(row=7, column=0, pady=10)
+        self.convert_button.grid(row=12, column=0, pady=10)
 
 
 
@@ -60,78 +103,120 @@ class TextToSpeechConverterTab:
         if folder:
             self.output_folder_var.set(folder)
 
+    def select_input_file(self):
+        path = filedialog.askopenfilename(filetypes=[("Text or CSV", "*.txt *.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        self.input_file_var.set(path)
+        columns = []
+        if path.lower().endswith(".csv"):
+            try:
+                columns = csv_columns(path)
+            except (OSError, UnicodeDecodeError) as e:
+                messagebox.showerror("Input File", f"Could not read the CSV header:\n{e}")
+        for menu in self.column_menus:
+            menu.config(values=[""] + columns, state="readonly" if columns else "disabled")
+        self.text_column_var.set(columns[0] if columns else "")
+        self.key_column_var.set("")
+        self.lang_column_var.set("")
+
+    def clear_input_file(self):
+        self.input_file_var.set("")
+        for menu in self.column_menus:
+            menu.config(values=[""], state="disabled")
+        for variable in (self.text_column_var, self.key_column_var, self.lang_column_var):
+            variable.set("")
+
     def convert_text(self):
         threading.Thread(target=self.convert_text_thread, daemon=True).start()
 
 
 
     def convert_text_thread(self):
-        text = self.text_box.get("1.0", tk.END).strip()
-        if not text:
-            messagebox.showwarning("Input Error", "Please enter some text.")
+        input_file = self.input_file_var.get().strip()
+        text = "" if input_file else self.text_box.get("1.0", tk.END).strip()
+        if not input_file and not text:
+            messagebox.showwarning("Input Error", "Please enter some text or choose an input file.")
             return
 
         output_format = self.format_var.get().lower()
-        lines = text.splitlines()
         output_dir = self.output_folder_var.get().strip()
         
         if not output_dir:
             messagebox.showwarning("Output Folder", "Please select an output folder.")
             return
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        format_params = {
-            "wav": {"format": "wav", "parameters": []},
-            "m4a": {"format": "mp4", "parameters": ["-acodec", "aac", "-b:a", "128k"]},
-            "mp3": {"format": "mp3", "parameters": ["-acodec", "libmp3lame", "-b:a", "128k"]}
-        }
-
-        total_lines = len(lines)
-        self.progress["maximum"] = total_lines  # Set max value for progress bar
-
-        for i, line in enumerate(lines, start=1):
-            line = line.strip()
-            if not line:
-                continue
-
-            words = line.split()
-            if not words:
-                continue
-
-            first_word = words[0]
-            index_str = f"{i:02d}"
-            base_filename = f"{index_str}-{first_word}"
-            temp_mp3 = os.path.join(output_dir, base_filename + ".mp3")
-            final_filename = os.path.join(output_dir, f"{base_filename}.{output_format}")
-
+        try:
+            workers = int(self.workers_spinbox.get())
+            rate_limit = float(self.rate_limit_var.get() or 0)
+            if workers < 1 or rate_limit < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showwarning("Input Error", "Workers must be a positive integer and Requests/s a non-negative number.")
+            return
+        cache = None
+        if self.use_cache_var.get():
             try:
-                tts = gTTS(text=line, lang='de')
-                tts.save(temp_mp3)
-            except Exception as e:
-                messagebox.showerror("Conversion Error", f"Error converting line {i}:\n{e}")
-                continue
-
+                cache = TTSCache(max_bytes=float(self.cache_limit_var.get()) * 1024 * 1024)
+            except ValueError:
+                messagebox.showwarning("Input Error", "Cache Limit must be a number of megabytes.")
+                return
+
+        errors = []
+        cache_warnings = []
+        self.root.after(0, lambda: self.progress.config(value=0))
+        if input_file:
+            def entries():
+                return file_entries(input_file, 'de', self.text_column_var.get() or None,
+                                    self.key_column_var.get() or None, self.lang_column_var.get() or None)
             try:
-                audio = AudioSegment.from_mp3(temp_mp3)
-                audio = audio.set_channels(2).set_frame_rate(44100)
-                fmt_info = format_params[output_format]
-                audio.export(final_filename, format=fmt_info["format"], parameters=fmt_info["parameters"])
-            except Exception as e:
-                messagebox.showerror("Conversion Error", f"Error converting file for line {i}:\n{e}")
-                continue
-            finally:
-                if os.path.exists(temp_mp3):
-                    os.remove(temp_mp3)
-
-            # **Update Progress Bar**
-            self.progress["value"] = i
-            self.frame.update_idletasks()  # Refresh UI
-
-            time.sleep(0.1)  # Optional: Smooth progress effect
-
-        self.progress["value"] = 0  # Reset progress bar
-        messagebox.showinfo("Success", "Conversion completed successfully.")
+                total = count_entries(entries())
+                convert_entries(entries(), output_dir, output_format, progress=self.update_progress,
+                                on_error=lambda i, message: errors.append(message),
+                                workers=workers, rate_limit=rate_limit or None, cache=cache, total=total,
+                                log=cache_warnings.append)
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                messagebox.showerror("Input File", str(e))
+                return
+        else:
+            convert_lines(text.splitlines(), output_dir, output_format, lang='de',
+                          progress=self.update_progress,
+                          on_error=lambda i, message: errors.append(message),
+                          workers=workers, rate_limit=rate_limit or None, cache=cache,
+                          log=cache_warnings.append)
+        if cache is not None:
+            self.show_cache_stats(cache.stats())
+        if cache_warnings:
+            messagebox.showwarning("Cache", f"{len(cache_warnings)} files could not be cached, first:\n"
+                                            f"{cache_warnings[0]}")
+
+        self.root.after(0, lambda: self.progress.config(value=0))  # Reset progress bar
+        if errors:
+            self.show_conversion_errors(errors)
+        else:
+            messagebox.showinfo("Success", "Conversion completed successfully.")
+
+
+    def update_progress(self, done, total):
+        # Called on the conversion thread; Tk widgets are only touched from the main loop
+        self.root.after(0, lambda: self.progress.config(maximum=total, value=done))
+
+    def show_cache_stats(self, stats):
+        text = (f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} files,"
+                f" {stats['size_bytes'] / (1024 * 1024):.1f} of {stats['max_bytes'] / (1024 * 1024):.0f} MB")
+        self.root.after(0, lambda: self.cache_stats_var.set(text))
+
+    def clear_cache(self):
+        if not messagebox.askyesno("Clear Cache", "Delete all cached audio files?"):
+            return
+        cache = TTSCache()
+        cache.clear()
+        self.show_cache_stats(cache.stats())
+
+    def show_conversion_errors(self, errors):
+        shown = "\n\n".join(errors[:5])
+        if len(errors) > 5:
+            shown += f"\n\n... and {len(errors) - 5} more"
+        messagebox.showerror("Conversion Error", f"{len(errors)} lines failed:\n\n{shown}")
 
 
     '''
@@ -0,0 +1,128 @@
+import wave
+import struct
+import numpy as np
+from silence_detection import samples_from_raw
+
+# Read-only memory map of the PCM data chunk of a WAV file. Samples come back the way pydub
+# holds them (signed, 24-bit widened to 32-bit), so results match the AudioSegment path
+# while only the frames being read are paged in.
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+COPY_BLOCK_FRAMES = 1 << 18
+
+def apply_gain(samples, gain, sample_width):
+    # Scales, clips to the sample range and rounds down like audioop.mul; returns floats
+    limit = 2 ** (sample_width * 8 - 1)
+    return np.floor(np.clip(samples * gain, -limit, limit - 1))
+
+def read_wav_layout(path):
+    # Returns the fmt fields and the byte offset and size of the data chunk
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(0)
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in {path}")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                f.seek(size & 1, 1)
+            elif chunk_id == b"data":
+                if fmt is None or len(fmt) < 16:
+                    raise ValueError(f"No fmt chunk before the data in {path}")
+                audio_format, channels, frame_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+                    raise ValueError(f"Unsupported WAV format 0x{audio_format:X} in {path}")
+                offset = f.tell()
+                return {
+                    "channels": channels,
+                    "frame_rate": frame_rate,
+                    "source_width": bits // 8,
+                    "offset": offset,
+                    "size": min(size, file_size - offset),
+                }
+            else:
+                f.seek(size + (size & 1), 1)
+
+class MappedWav:
+    def __init__(self, path):
+        layout = read_wav_layout(path)
+        self.path = path
+        self.channels = layout["channels"]
+        self.frame_rate = layout["frame_rate"]
+        self.source_width = layout["source_width"]
+        self.sample_width = 4 if self.source_width == 3 else self.source_width
+        self.frames = layout["size"] // (self.channels * self.source_width)
+        size = self.frames * self.channels * self.source_width
+        if size:
+            self.data = np.memmap(path, dtype=np.uint8, mode="r", offset=layout["offset"], shape=(size,))
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data = np.zeros(0, dtype=np.uint8)
+
+    def raw(self, first, last):
+        # Zero-copy view of the bytes of frames [first, last)
+        frame_width = self.channels * self.source_width
+        return self.data[first * frame_width:last * frame_width]
+
+    def frames_view(self, first, last):
+        # Zero-copy (frames, channels) view of frames [first, last) in the file's own format:
+        # unsigned 8-bit, int16, int32, or (frames, channels, 3) bytes for 24-bit
+        raw = self.raw(first, last)
+        if self.source_width == 3:
+            return raw.reshape(-1, self.channels, 3)
+        return raw.view({1: np.uint8, 2: '<i2', 4: '<i4'}[self.source_width]).reshape(-1, self.channels)
+
+    def read(self, first, last):
+        # Interleaved samples of frames [first, last); views into the map except for 8/24-bit
+        raw = self.raw(first, last)
+        if self.source_width == 1:
+            return raw.astype(np.int16) - 128
+        if self.source_width == 3:
+            # pydub widens with a leading pad byte that is 0xFF for negative samples
+            samples = samples_from_raw(raw, 3)
+            return (samples << 8) | np.where(samples < 0, 0xFF, 0)
+        return raw.view('<i2' if self.source_width == 2 else '<i4')
+
+    def encode(self, samples):
+        if self.sample_width == 1:
+            return (samples + 128).astype(np.uint8).tobytes()
+        return samples.astype('<i2' if self.sample_width == 2 else '<i4').tobytes()
+
+    def write_segment(self, path, first, last, gain=None):
+        # Writes frames [first, last) as a WAV file the way AudioSegment.export does,
+        # zero-padding past the end of the data; gain is a linear factor applied like
+        # audioop.mul. Frames are copied COPY_BLOCK_FRAMES at a time.
+        available = min(last, self.frames)
+        with wave.open(path, "wb") as out:
+            out.setnchannels(self.channels)
+            out.setsampwidth(self.sample_width)
+            out.setframerate(self.frame_rate)
+            out.setnframes(last - first if first < available else 0)
+            for block_first in range(first, available, COPY_BLOCK_FRAMES):
+                block_last = min(block_first + COPY_BLOCK_FRAMES, available)
+                if gain is None and self.source_width != 3:
+                    out.writeframesraw(self.raw(block_first, block_last))
+                    continue
+                samples = self.read(block_first, block_last)
+                if gain is not None:
+                    samples = apply_gain(samples, gain, self.sample_width)
+                out.writeframesraw(self.encode(samples))
+            if first < available < last:
+                silence = self.encode(np.zeros((last - available) * self.channels, dtype=np.int64))
+                out.writeframesraw(silence)